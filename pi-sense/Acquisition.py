@@ -0,0 +1,401 @@
+# Copyright 2014 Nashwan Azhari, Robert Krody, Tudor Vioreanu.
+# Licensed under the GPLv2, see LICENSE for details.
+
+import ctypes, ctypes.util, multiprocessing, os, signal, struct, time, zlib
+from multiprocessing import shared_memory
+import RPi.GPIO as gpio
+
+from SHT11 import SHT11, SensorError, AckError, ConversionTimeoutError, \
+        CRCError
+
+
+class Acquisition(object):
+    """
+        Runs the SHT11 driver in a dedicated child process, isolated from
+        whatever else runs in the main one, so that the timing of the
+        bit-banged protocol is not disturbed by the GIL or by other work.
+
+        The child process is pinned to a single CPU, scheduled as SCHED_FIFO
+        and has its memory locked, wherever permitted. It samples the sensor
+        at a fixed period and publishes each sample in a block of shared
+        memory guarded by a seqlock: the writer makes the sequence number odd
+        before updating the sample and even again afterwards, and readers
+        retry until they read the same even sequence number on both sides
+        of the sample. Neither side ever blocks on the other.
+
+        Python offers no memory barriers, so on a weakly ordered CPU such as
+        the ARM of the Pi the reader may still see the stores of the writer
+        out of order. Each sample is thus stored along with its CRC-32, and
+        readers also retry until the sample matches it.
+
+        Commands (resets and stopping) travel the other way through a
+        separate block of the same shared memory.
+
+        The child process is spawned rather than forked, as the main process
+        runs threads (those of the bus) which a forked child could inherit
+        held locks from, and deadlock on. It thus starts from a fresh
+        interpreter, attaching to the shared memory by its name. Programs
+        creating an Acquisition must guard their entry point with
+        if __name__ == "__main__", as the child imports their main module.
+
+        To the main process, an Acquisition looks like an SHT11, so it may
+        take its place inside a WeatherStation.
+
+        Example usage:
+        >>> from Acquisition import Acquisition
+        >>>
+        >>> acq = Acquisition(27, 4, cpu=3, priority=50)
+        >>> rawt, rawh = acq.raw()
+        >>> acq.close()
+    """
+
+    # sample block: sequence | timestamp | raw temp | raw humid | error |
+    # sample number | CRC-32 of the preceding fields of the sample
+    __seq = struct.Struct("<I")
+    __sample = struct.Struct("<dHHII")
+    __check = struct.Struct("<I")
+
+    # command block: command number | command code | stop flag
+    __command = struct.Struct("<III")
+    __commandoffset = 32
+
+    # command codes
+    __reset = 1
+    __softreset = 2
+
+    # error codes for the errors which occured in the child
+    __errors = {1: AckError, 2: ConversionTimeoutError, 3: CRCError,
+            4: SensorError}
+    __codes = {"ack": 1, "timeout": 2, "crc": 3, "other": 4}
+
+    # mlockall() flags
+    __MCL_CURRENT = 1
+    __MCL_FUTURE = 2
+
+
+    def __init__(self, datapin, clkpin, mode=gpio.BCM, crc=True, period=1.0,
+            cpu=None, priority=None):
+        """
+            Instantiates an Acquisition and starts its child process.
+
+            @param: datapin, clkpin, mode, crc - as for SHT11.
+
+            @param: period - seconds between the start of two samples.
+                default = 1.0
+
+            @param: cpu - the CPU the child process is pinned to, None to
+                leave its affinity untouched.
+                default = None
+
+            @param: priority - SCHED_FIFO priority of the child process
+                (1..99), None to leave its scheduling untouched.
+                default = None
+        """
+        self.datapin = datapin
+        self.clockpin = clkpin
+        self.mode = mode
+        self.crc = crc
+        self.period = period
+        self.cpu = cpu
+        self.priority = priority
+
+        # timestamp at which the last returned sample was taken
+        self.timestamp = None
+
+        # named, so that the spawned child may attach to it
+        self.__memory = shared_memory.SharedMemory(create=True,
+                size=self.__commandoffset + self.__command.size)
+        self.__shm = self.__memory.buf
+        self.__commands = 0
+        self.__last = 0
+        self.__process = None
+
+        # publish an empty sample, so that readers find a valid one
+        self.__publish(0, 0.0, 0, 0, 0, 0)
+        self.__start()
+
+
+    def __start(self):
+        """
+            Spawns the child process.
+
+            @param: None
+
+            @return: None
+        """
+        self.__command.pack_into(self.__shm, self.__commandoffset,
+                self.__commands, 0, 0)
+
+        context = multiprocessing.get_context("spawn")
+        self.__process = context.Process(target=self.run, daemon=True)
+        self.__process.start()
+
+
+    def __getstate__(self):
+        """
+            Pickles the Acquisition for the child process: its settings and
+            the name of the shared memory, without the parent's handles.
+
+            @param: None
+
+            @return: dict of the state of the Acquisition.
+        """
+        state = self.__dict__.copy()
+        state["_Acquisition__memory"] = self.__memory.name
+        del state["_Acquisition__shm"]
+        del state["_Acquisition__process"]
+        return state
+
+
+    def __setstate__(self, state):
+        """
+            Unpickles the Acquisition in the child process, attaching to the
+            shared memory.
+
+            @param: state - dict returned by __getstate__().
+
+            @return: None
+        """
+        self.__dict__.update(state)
+        self.__memory = shared_memory.SharedMemory(name=self.__memory)
+        self.__shm = self.__memory.buf
+        self.__process = None
+
+
+    def __isolate(self):
+        """
+            Pins the calling process to its CPU, switches it to SCHED_FIFO and
+            locks its memory. Each step is skipped with a warning if it is not
+            permitted.
+
+            @param: None
+
+            @return: None
+        """
+        if self.cpu is not None:
+            try:
+                os.sched_setaffinity(0, {self.cpu})
+            except (AttributeError, OSError) as e:
+                print("Could not pin acquisition to CPU %d: %s" % (self.cpu, e))
+
+        if self.priority is not None:
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO,
+                        os.sched_param(self.priority))
+            except (AttributeError, OSError) as e:
+                print("Could not set SCHED_FIFO priority: %s" % e)
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if libc.mlockall(self.__MCL_CURRENT | self.__MCL_FUTURE) != 0:
+            print("Could not lock acquisition memory: %s" %
+                    os.strerror(ctypes.get_errno()))
+
+
+    def __publish(self, seq, timestamp, rawt, rawh, error, count):
+        """
+            Writes a sample under the seqlock.
+
+            @param: seq - the current, even, sequence number.
+
+            @param: timestamp, rawt, rawh, error, count - the sample.
+
+            @return: the new sequence number.
+        """
+        sample = self.__sample.pack(timestamp, rawt, rawh, error, count)
+        offset = self.__seq.size
+
+        self.__seq.pack_into(self.__shm, 0, seq + 1)
+        self.__shm[offset:offset + len(sample)] = sample
+        self.__check.pack_into(self.__shm, offset + len(sample),
+                zlib.crc32(sample))
+        self.__seq.pack_into(self.__shm, 0, seq + 2)
+        return seq + 2
+
+
+    def run(self):
+        """
+            Main loop of the child process: handles pending commands and
+            samples the sensor once every period, until told to stop. Not
+            to be called from the main process.
+
+            @param: None
+
+            @return: None
+        """
+        # a Ctrl-C reaches the whole process group: leave signals to the
+        # parent, and only ever touch the sensor pins
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        self.__isolate()
+        sensor = SHT11(self.datapin, self.clockpin, self.mode, self.crc)
+
+        seq = self.__seq.unpack_from(self.__shm, 0)[0] & ~1
+        count = self.__sample.unpack_from(self.__shm, self.__seq.size)[4]
+        handled = self.__commands
+        due = time.monotonic()
+
+        while True:
+            number, code, stop = self.__command.unpack_from(self.__shm,
+                    self.__commandoffset)
+            if stop:
+                break
+
+            if number != handled:
+                handled = number
+                try:
+                    if code == self.__reset:
+                        sensor.reset()
+                    elif code == self.__softreset:
+                        sensor.softreset()
+                except SensorError:
+                    pass
+                # sample right away after a reset
+                due = time.monotonic()
+
+            now = time.monotonic()
+            if now < due:
+                time.sleep(min(due - now, 0.01))
+                continue
+            due += self.period
+
+            rawt = rawh = error = 0
+            try:
+                rawt, rawh = sensor.raw()
+            except SensorError as e:
+                error = self.__codes.get(e.kind, self.__codes["other"])
+
+            count += 1
+            seq = self.__publish(seq, time.time(), rawt, rawh, error, count)
+
+        gpio.cleanup((self.datapin, self.clockpin))
+
+        # the view must go before the mapping it was taken of
+        self.__shm.release()
+        self.__memory.close()
+
+
+    def __read(self):
+        """
+            Reads the latest sample under the seqlock.
+
+            @param: None
+
+            @return: tuple of (timestamp, rawt, rawh, error, count).
+
+            @raise: SensorError - if the child process exited whilst
+                publishing a sample.
+        """
+        offset = self.__seq.size
+        end = offset + self.__sample.size
+        spins = 0
+
+        while True:
+            before = self.__seq.unpack_from(self.__shm, 0)[0]
+            if not before & 1:
+                # copied, as a slice of the memory would be a live view
+                sample = bytes(self.__shm[offset:end])
+                check = self.__check.unpack_from(self.__shm, end)[0]
+                if self.__seq.unpack_from(self.__shm, 0)[0] == before and \
+                        zlib.crc32(sample) == check:
+                    return self.__sample.unpack(sample)
+
+            # a child which died mid-write leaves the sequence odd for good
+            spins += 1
+            if spins % 1000 == 0:
+                if not self.__process.is_alive():
+                    raise SensorError("Acquisition process has exited.")
+                time.sleep(0.001)
+
+
+    def __send(self, code):
+        """
+            Sends a command to the child process.
+
+            @param: code - the code of the command.
+
+            @return: None
+        """
+        self.__commands = (self.__commands + 1) & 0xFFFFFFFF
+        self.__command.pack_into(self.__shm, self.__commandoffset,
+                self.__commands, code, 0)
+
+
+    def raw(self):
+        """
+            Returns the oldest sample not yet returned, waiting for the child
+            process to publish one if need be. Should the main process lag,
+            older samples are skipped in favour of the latest.
+
+            @param: None
+
+            @return: tuple of the raw temperature and raw humidity words.
+
+            @raise: SensorError - the error which occured in the child whilst
+                taking the sample, or if no sample arrived in due time.
+        """
+        deadline = time.monotonic() + 2 * self.period + 1.0
+
+        while True:
+            timestamp, rawt, rawh, error, count = self.__read()
+            if count != self.__last:
+                break
+
+            if not self.__process.is_alive():
+                raise SensorError("Acquisition process has exited.")
+            if time.monotonic() > deadline:
+                raise ConversionTimeoutError("No sample published in time.")
+            time.sleep(0.005)
+
+        self.__last = count
+        self.timestamp = timestamp
+
+        if error:
+            raise self.__errors[error]("Sampling failed in acquisition "
+                    "process.")
+        return rawt, rawh
+
+
+    def reset(self):
+        """
+            Has the child process perform a hard reset on the sensor,
+            restarting the child process first should it have exited.
+
+            @param: None
+
+            @return: None
+        """
+        if not self.__process.is_alive():
+            self.__start()
+        self.__send(self.__reset)
+
+
+    def softreset(self):
+        """
+            Has the child process issue a soft reset to the sensor.
+
+            @param: None
+
+            @return: None
+        """
+        self.__send(self.__softreset)
+
+
+    def close(self):
+        """
+            Stops the child process and frees the shared memory.
+
+            @param: None
+
+            @return: None
+        """
+        self.__command.pack_into(self.__shm, self.__commandoffset,
+                self.__commands, 0, 1)
+        self.__process.join(self.period + 1.0)
+        if self.__process.is_alive():
+            self.__process.terminate()
+            self.__process.join()
+
+        self.__shm.release()
+        self.__memory.close()
+        self.__memory.unlink()
@@ -0,0 +1,264 @@
+# Copyright 2014 Nashwan Azhari, Robert Krody, Tudor Vioreanu.
+# Licensed under the GPLv2, see LICENSE for details.
+
+import collections, threading
+
+
+class Subscription(object):
+    """
+        A single subscriber of a Bus: a bounded queue of published items and
+        the thread which hands them, in order, to the subscriber's callback.
+
+        When the queue is full, the policy decides what happens to a newly
+        published item:
+            drop  :: the oldest queued item is discarded to make room
+            block :: the publisher waits until the subscriber makes room
+
+        Counters:
+            delivered :: items handed to the callback
+            dropped   :: items discarded under the drop policy
+            failed    :: items on which the callback raised
+            maxlag    :: largest number of items ever queued at once
+        while lag is the number of items currently queued.
+    """
+
+    DROP = "drop"
+    BLOCK = "block"
+
+
+    def __init__(self, name, callback, maxsize=16, policy=DROP):
+        """
+            Instantiates a Subscription and starts its thread.
+
+            @param: name - name of the subscriber, used in reports.
+
+            @param: callback - callable invoked with each published item.
+
+            @param: maxsize - maximum number of queued items.
+                default = 16
+
+            @param: policy - what to do when the queue is full.
+                Subscription.DROP  :: drop the oldest item
+                Subscription.BLOCK :: block the publisher
+                default = Subscription.DROP
+        """
+        if policy not in [self.DROP, self.BLOCK]:
+            raise ValueError("Unknown queue policy %r." % policy)
+
+        self.name = name
+        self.callback = callback
+        self.maxsize = maxsize
+        self.policy = policy
+
+        self.delivered = 0
+        self.dropped = 0
+        self.failed = 0
+        self.maxlag = 0
+
+        self.__queue = collections.deque()
+        self.__condition = threading.Condition()
+        self.__busy = False
+        self.__closed = False
+
+        self.__thread = threading.Thread(target=self.__run,
+                name="bus-%s" % name, daemon=True)
+        self.__thread.start()
+
+
+    @property
+    def lag(self):
+        """
+            The number of items published to but not yet taken by this
+            subscriber.
+        """
+        return len(self.__queue)
+
+
+    def put(self, item):
+        """
+            Queues an item for the subscriber, applying the queue policy if
+            the queue is full.
+
+            @param: item - the published item.
+
+            @return: None
+        """
+        with self.__condition:
+            if len(self.__queue) >= self.maxsize:
+                if self.policy == self.DROP:
+                    self.__queue.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self.__queue) >= self.maxsize and \
+                            not self.__closed:
+                        self.__condition.wait()
+
+            self.__queue.append(item)
+            if len(self.__queue) > self.maxlag:
+                self.maxlag = len(self.__queue)
+            self.__condition.notify_all()
+
+
+    def __run(self):
+        """
+            Hands queued items to the callback until closed and drained.
+
+            @param: None
+
+            @return: None
+        """
+        while True:
+            with self.__condition:
+                while not self.__queue and not self.__closed:
+                    self.__condition.wait()
+                if not self.__queue:
+                    return
+
+                item = self.__queue.popleft()
+                self.__busy = True
+                self.__condition.notify_all()
+
+            try:
+                self.callback(item)
+            except Exception as e:
+                self.failed += 1
+                print("Subscriber %r failed: %s" % (self.name, e))
+
+            with self.__condition:
+                self.__busy = False
+                self.delivered += 1
+                self.__condition.notify_all()
+
+
+    def drain(self):
+        """
+            Waits until every queued item has been handled.
+
+            @param: None
+
+            @return: None
+        """
+        with self.__condition:
+            while self.__queue or self.__busy:
+                self.__condition.wait()
+
+
+    def close(self):
+        """
+            Handles every queued item, then stops the thread.
+
+            @param: None
+
+            @return: None
+        """
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+        self.__thread.join()
+
+
+class Bus(object):
+    """
+        In-process publish/subscribe bus.
+
+        Each published item is handed, as the very same object, to every
+        subscriber, so published items must not be modified afterwards.
+        Subscribers are decoupled from the publisher and from each other by
+        their own bounded queues and threads: a slow subscriber only ever
+        lags or drops items itself, unless it asked for the block policy.
+
+        Example usage:
+        >>> from Bus import Bus, Subscription
+        >>>
+        >>> bus = Bus()
+        >>> sub = bus.subscribe("printer", print, maxsize=8,
+        ...         policy=Subscription.DROP)
+        >>> bus.publish(reading)
+        >>> bus.drain()
+        >>> print(sub.delivered, sub.dropped, sub.lag)
+        >>> bus.close()
+    """
+
+    def __init__(self):
+        """
+            Instantiates a Bus without any subscribers.
+        """
+        # replaced rather than modified, so that publish() may iterate over
+        # it without locking
+        self.subscriptions = []
+
+
+    def subscribe(self, name, callback, maxsize=16, policy=Subscription.DROP):
+        """
+            Registers a subscriber.
+
+            @param: name, callback, maxsize, policy - as for Subscription.
+
+            @return: the new Subscription.
+        """
+        subscription = Subscription(name, callback, maxsize, policy)
+        self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+
+    def unsubscribe(self, subscription):
+        """
+            Unregisters a subscriber, after it has handled all of its queued
+            items.
+
+            @param: subscription - the Subscription to be removed.
+
+            @return: None
+        """
+        self.subscriptions = [s for s in self.subscriptions
+                if s is not subscription]
+        subscription.close()
+
+
+    def publish(self, item):
+        """
+            Publishes an item to all subscribers.
+
+            @param: item - the item to be published.
+
+            @return: None
+        """
+        for subscription in self.subscriptions:
+            subscription.put(item)
+
+
+    def drain(self):
+        """
+            Waits until every subscriber has handled all of its queued items.
+
+            @param: None
+
+            @return: None
+        """
+        for subscription in self.subscriptions:
+            subscription.drain()
+
+
+    def stats(self):
+        """
+            Returns the counters of every subscriber.
+
+            @param: None
+
+            @return: dict of subscriber name to a dict of its counters.
+        """
+        return dict((s.name, {"delivered": s.delivered, "dropped": s.dropped,
+                "failed": s.failed, "lag": s.lag, "maxlag": s.maxlag})
+                for s in self.subscriptions)
+
+
+    def close(self):
+        """
+            Unregisters all subscribers, after they handled their items.
+
+            @param: None
+
+            @return: None
+        """
+        for subscription in self.subscriptions:
+            self.unsubscribe(subscription)
@@ -0,0 +1,261 @@
+# Copyright 2014 Nashwan Azhari, Robert Krody, Tudor Vioreanu.
+# Licensed under the GPLv2, see LICENSE for details.
+
+import struct
+
+
+# block header: magic | version | sample count | resolution (ms per tick) |
+# first timestamp (ticks) | first raw temperature | first raw humidity
+MAGIC = b"PSHB"
+VERSION = 1
+HEADER = struct.Struct("<4sBHHqHH")
+
+# buckets of the delta-of-delta timestamp encoding, after the '0' prefix
+# which stands for a delta-of-delta of 0: (prefix, prefix bits, value bits)
+TIME_BUCKETS = [(0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12)]
+TIME_ESCAPE = (0b1111, 4, 32)
+
+# buckets of the delta encoding of the raw words, the escape storing the
+# whole word rather than its delta
+WORD_BUCKETS = [(0b10, 2, 3), (0b110, 3, 6), (0b1110, 4, 9)]
+WORD_ESCAPE = (0b1111, 4, 16)
+
+
+class Encoder(object):
+    """
+        Streaming encoder of a block of samples, after the scheme of
+        Facebook's Gorilla ("Gorilla: A Fast, Scalable, In-Memory Time Series
+        Database", 2015), adapted to the raw words of the SHT11.
+
+        The first sample is stored whole in the block header. Every following
+        timestamp is stored as the difference between its delta and the
+        previous one, which is 0 for a regular sampling period and thus fits
+        in a single bit. The raw temperature and humidity words are stored as
+        their delta from the previous word, which is a handful of counts of
+        noise for slowly changing readings.
+
+        Each value is written as a short prefix naming the size of the value
+        which follows:
+            0            :: no change
+            10   + n1    :: value within the smallest bucket
+            110  + n2    :: value within the middle bucket
+            1110 + n3    :: value within the largest bucket
+            1111 + full  :: anything else, stored in full
+        A steadily sampled reading thus takes around 12 bits instead of the
+        16 bytes of its naive representation.
+
+        Example usage:
+        >>> from Codec import Encoder, decode
+        >>>
+        >>> encoder = Encoder(resolution=1000)
+        >>> encoder.append(1418035200.0, 6700, 1473)
+        >>> encoder.append(1418035201.0, 6702, 1471)
+        >>> block = encoder.finish()
+        >>> decode(block)
+    """
+
+    def __init__(self, resolution=1000):
+        """
+            Instantiates an Encoder of an empty block.
+
+            @param: resolution - resolution of the stored timestamps, in ms.
+                default = 1000
+
+            @raise: ValueError - if the resolution does not fit the header.
+        """
+        if not 1 <= resolution <= 65535:
+            raise ValueError("Invalid resolution %r, expected 1..65535." %
+                    resolution)
+
+        self.resolution = resolution
+        self.count = 0
+
+        self.__out = bytearray()
+        self.__acc = 0
+        self.__bits = 0
+
+        self.__first = None
+        self.__time = 0
+        self.__delta = 0
+        self.__rawt = 0
+        self.__rawh = 0
+
+
+    def __write(self, value, bits):
+        """
+            Appends the lowest bits of a value to the block.
+
+            @param: value - the value to be written.
+
+            @param: bits - the number of bits to be written.
+
+            @return: None
+        """
+        self.__acc = (self.__acc << bits) | (value & ((1 << bits) - 1))
+        self.__bits += bits
+        while self.__bits >= 8:
+            self.__bits -= 8
+            self.__out.append((self.__acc >> self.__bits) & 0xFF)
+        self.__acc &= (1 << self.__bits) - 1
+
+
+    def __encode(self, value, buckets, escape, whole):
+        """
+            Writes a value using the smallest bucket it fits in.
+
+            @param: value - the signed value to be written.
+
+            @param: buckets - the list of (prefix, prefix bits, value bits).
+
+            @param: escape - the bucket used if none of the others fit.
+
+            @param: whole - what is written after the escape prefix.
+
+            @return: None
+        """
+        if value == 0:
+            self.__write(0, 1)
+            return
+
+        for prefix, prefixbits, bits in buckets:
+            half = 1 << (bits - 1)
+            if -half < value <= half:
+                self.__write(prefix, prefixbits)
+                self.__write(value + half - 1, bits)
+                return
+
+        prefix, prefixbits, bits = escape
+        self.__write(prefix, prefixbits)
+        self.__write(whole, bits)
+
+
+    def append(self, timestamp, rawt, rawh):
+        """
+            Appends a sample to the block.
+
+            @param: timestamp - the timestamp of the sample, in seconds.
+
+            @param: rawt - the raw temperature word.
+
+            @param: rawh - the raw humidity word.
+
+            @return: None
+        """
+        ticks = int(round(timestamp * 1000.0 / self.resolution))
+
+        if self.count == 0:
+            self.__first = (ticks, rawt, rawh)
+        else:
+            delta = ticks - self.__time
+            dod = delta - self.__delta
+            self.__encode(dod, TIME_BUCKETS, TIME_ESCAPE, dod)
+            self.__delta = delta
+
+            self.__encode(rawt - self.__rawt, WORD_BUCKETS, WORD_ESCAPE, rawt)
+            self.__encode(rawh - self.__rawh, WORD_BUCKETS, WORD_ESCAPE, rawh)
+
+        self.__time = ticks
+        self.__rawt = rawt
+        self.__rawh = rawh
+        self.count += 1
+
+
+    def size(self):
+        """
+            Returns the size the block would have if finished now.
+
+            @param: None
+
+            @return: the size in bytes.
+        """
+        return HEADER.size + len(self.__out) + (1 if self.__bits else 0)
+
+
+    def finish(self):
+        """
+            Returns the encoded block. The Encoder may not be appended to
+            afterwards.
+
+            @param: None
+
+            @return: bytes of the block.
+        """
+        if self.count == 0:
+            raise ValueError("Cannot finish an empty block.")
+
+        ticks, rawt, rawh = self.__first
+        header = HEADER.pack(MAGIC, VERSION, self.count, self.resolution,
+                ticks, rawt, rawh)
+
+        tail = b""
+        if self.__bits:
+            tail = bytes([(self.__acc << (8 - self.__bits)) & 0xFF])
+
+        return header + bytes(self.__out) + tail
+
+
+def decode(block):
+    """
+        Decodes a block produced by an Encoder.
+
+        @param: block - bytes of the block.
+
+        @return: tuple of the lists of timestamps (seconds), raw temperature
+            words and raw humidity words.
+    """
+    magic, version, count, resolution, ticks, rawt, rawh = \
+            HEADER.unpack_from(block)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not an encoded block.")
+
+    data = memoryview(block)[HEADER.size:]
+    scale = resolution / 1000.0
+    timestamps = [ticks * scale]
+    rawts = [rawt]
+    rawhs = [rawh]
+
+    # bit reader state, refilled eight bytes at a time
+    state = [0, 0, 0]
+
+    def read(bits):
+        acc, avail, pos = state
+        while avail < bits:
+            chunk = data[pos:pos + 8]
+            acc = (acc << (8 * len(chunk))) | int.from_bytes(chunk, "big")
+            avail += 8 * len(chunk)
+            pos += len(chunk)
+            if not chunk:
+                raise ValueError("Truncated block.")
+        avail -= bits
+        value = acc >> avail
+        state[0] = acc & ((1 << avail) - 1)
+        state[1] = avail
+        state[2] = pos
+        return value
+
+    def value(buckets, escape):
+        if not read(1):
+            return 0, False
+        for prefix, prefixbits, bits in buckets:
+            if not read(1):
+                return read(bits) - (1 << (bits - 1)) + 1, False
+        return read(escape[2]), True
+
+    delta = 0
+    for i in range(count - 1):
+        dod, whole = value(TIME_BUCKETS, TIME_ESCAPE)
+        if whole and dod >= 1 << 31:
+            dod -= 1 << 32
+        delta += dod
+        ticks += delta
+        timestamps.append(ticks * scale)
+
+        diff, whole = value(WORD_BUCKETS, WORD_ESCAPE)
+        rawt = diff if whole else rawt + diff
+        rawts.append(rawt)
+
+        diff, whole = value(WORD_BUCKETS, WORD_ESCAPE)
+        rawh = diff if whole else rawh + diff
+        rawhs.append(rawh)
+
+    return timestamps, rawts, rawhs
@@ -0,0 +1,158 @@
+# Copyright 2014 Nashwan Azhari, Robert Krody, Tudor Vioreanu.
+# Licensed under the GPLv2, see LICENSE for details.
+
+import argparse, os, socket
+
+from Exporter import Exporter
+
+
+class Collector(object):
+    """
+        Reference receiver for the batches sent by an Exporter.
+        Keeps track of the sequence numbers of each station in order to
+        detect lost batches. A batch of a new session of a station (i.e.
+        from a restarted or reconfigured exporter) starts its sequence
+        afresh rather than counting as a gap, as does one arriving late,
+        behind the expected sequence number.
+
+        Example usage:
+        >>> from Collector import Collector
+        >>>
+        >>> collector = Collector("udp:0.0.0.0:9999")
+        >>> station, sequence, records = collector.receive()
+        >>> for timestamp, temperature, humidity in records:
+        ...     print(station, timestamp, temperature, humidity)
+        >>> collector.close()
+
+        It may also be run directly, printing every reading it receives:
+            python Collector.py udp:0.0.0.0:9999
+    """
+
+    def __init__(self, address):
+        """
+            Instantiates a Collector bound to the given address.
+
+            @param: address - where to listen, in the same format as the
+                Exporter's target.
+        """
+        family, self.address = Exporter.parse(address)
+
+        # current session and expected next sequence number, count of lost
+        # batches and count of restarts per station
+        self.sessions = {}
+        self.expected = {}
+        self.gaps = {}
+        self.restarts = {}
+
+        self.__socket = socket.socket(family, socket.SOCK_DGRAM)
+        if family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        self.__socket.bind(self.address)
+
+
+    def receive(self, timeout=None):
+        """
+            Waits for the next valid batch and decodes it.
+
+            @param: timeout - maximum number of seconds to wait, None to
+                wait indefinitely.
+                default = None
+
+            @return: tuple of the station, sequence number and list of
+                (timestamp, temperature, humidity) records.
+
+            @raise: socket.timeout - if no batch arrived in time.
+        """
+        self.__socket.settimeout(timeout)
+
+        while True:
+            data = self.__socket.recv(65535)
+            batch = self.decode(data)
+            if batch is None:
+                continue
+
+            station, session, sequence, records = batch
+            if self.sessions.get(station, session) != session:
+                self.restarts[station] = self.restarts.get(station, 0) + 1
+                del self.expected[station]
+            self.sessions[station] = session
+
+            expected = self.expected.get(station)
+            if expected is not None:
+                lost = (sequence - expected) & 0xFFFFFFFF
+                if lost >= 0x80000000:
+                    # a late batch, already counted as lost
+                    return station, sequence, records
+                if lost:
+                    self.gaps[station] = self.gaps.get(station, 0) + lost
+            self.expected[station] = (sequence + 1) & 0xFFFFFFFF
+
+            return station, sequence, records
+
+
+    @staticmethod
+    def decode(data):
+        """
+            Decodes a batch.
+
+            @param: data - the bytes of the datagram.
+
+            @return: tuple of the station, session, sequence number and
+                list of (timestamp, temperature, humidity) records, or None
+                if the datagram is not a valid batch.
+        """
+        header, record = Exporter.HEADER, Exporter.RECORD
+        if len(data) < header.size:
+            return None
+
+        magic, version, station, count, session, sequence = \
+                header.unpack_from(data)
+        end = header.size + count * record.size
+        if magic != Exporter.MAGIC or version != Exporter.VERSION or \
+                len(data) != end:
+            return None
+
+        records = [(seconds + millis / 1000.0, temp / 100.0, humid / 100.0)
+                for seconds, millis, temp, humid in
+                record.iter_unpack(memoryview(data)[header.size:end])]
+        return station, session, sequence, records
+
+
+    def close(self):
+        """
+            Closes the socket, removing it from the filesystem if need be.
+
+            @param: None
+
+            @return: None
+        """
+        self.__socket.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("address",
+                        help="Address to listen on (udp:host:port | unix:path)")
+    args = parser.parse_args()
+
+    collector = Collector(args.address)
+    try:
+        while True:
+            lost = sum(collector.gaps.values())
+            restarts = sum(collector.restarts.values())
+            station, sequence, records = collector.receive()
+            if sum(collector.restarts.values()) != restarts:
+                print("# station %d: restarted" % station)
+            if sum(collector.gaps.values()) != lost:
+                print("# station %d: %d batches lost so far" %
+                        (station, collector.gaps[station]))
+
+            for timestamp, temperature, humidity in records:
+                print("%d %d %.3f %.2f %.2f" % (station, sequence, timestamp,
+                        temperature, humidity))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        collector.close()
@@ -0,0 +1,208 @@
+# Copyright 2014 Nashwan Azhari, Robert Krody, Tudor Vioreanu.
+# Licensed under the GPLv2, see LICENSE for details.
+
+import random, socket, struct
+
+
+class Exporter(object):
+    """
+        Pushes readings to a collector in compact binary batches over a
+        datagram socket, either UDP or a Unix datagram socket.
+
+        Readings are buffered and sent as a single datagram once the batch is
+        full or once its oldest reading has grown too old, so as to keep the
+        number of wakeups and packets low. The age is checked with every
+        pushed reading, and may be checked in between with tick() (e.g.
+        whilst no readings can be taken).
+
+        Each batch consists of a fixed-layout header followed by the records,
+        all little-endian:
+            header :: magic (4s) | version (B) | station (B) | count (H) |
+                      session (I) | sequence (I)
+            record :: seconds (I) | milliseconds (H) |
+                      temperature (h, 0.01°C) | humidity (h, 0.01%RH)
+
+        The sequence number is incremented with every batch, including those
+        which could not be sent, so that the collector may detect gaps. It
+        starts from 0 with every Exporter, which picks a random session
+        number of its own, so that the collector may tell a restart of the
+        station (or a reload of its export settings) from lost batches.
+
+        Example usage:
+        >>> from Exporter import Exporter
+        >>>
+        >>> exporter = Exporter("udp:127.0.0.1:9999", station=1, batch=32)
+        >>> exporter.push(reading)
+        >>> exporter.tick(time.time())
+        >>> exporter.close()
+    """
+
+    MAGIC = b"PSNS"
+    VERSION = 2
+
+    HEADER = struct.Struct("<4sBBHII")
+    RECORD = struct.Struct("<IHhh")
+
+
+    def __init__(self, target, station=0, batch=32, maxage=60.0):
+        """
+            Instantiates an Exporter and its socket.
+
+            @param: target - where the batches are sent to.
+                udp:host:port :: UDP datagrams to the given host and port
+                unix:path     :: datagrams to the given Unix socket
+
+            @param: station - identifier of this station (0..255).
+                default = 0
+
+            @param: batch - maximum number of readings in a batch.
+                default = 32
+
+            @param: maxage - maximum age in seconds of the oldest buffered
+                reading before the batch is sent.
+                default = 60.0
+
+            @raise: ValueError - if the target, station or batch size is
+                invalid.
+        """
+        if not 0 <= station <= 255:
+            raise ValueError("Invalid export station %r, expected 0..255." %
+                    station)
+        if not 1 <= batch <= 65535:
+            raise ValueError("Invalid export batch %r, expected 1..65535." %
+                    batch)
+
+        family, self.address = self.parse(target)
+
+        self.station = station
+        self.batch = batch
+        self.maxage = maxage
+
+        # counters of sent batches and of readings which could not be sent
+        self.session = random.getrandbits(32)
+        self.sequence = 0
+        self.sent = 0
+        self.dropped = 0
+
+        self.__socket = socket.socket(family, socket.SOCK_DGRAM)
+        self.__socket.setblocking(False)
+
+        self.__buffer = bytearray(self.HEADER.size +
+                batch * self.RECORD.size)
+        self.__count = 0
+        self.__first = None
+
+
+    @staticmethod
+    def parse(target):
+        """
+            Parses a target specification.
+
+            @param: target - the target, as described in __init__.
+
+            @return: tuple of the socket family and address.
+        """
+        scheme, _, rest = target.partition(":")
+        scheme = scheme.lower()
+
+        if scheme == "unix" and rest:
+            return socket.AF_UNIX, rest
+
+        if scheme == "udp":
+            host, _, port = rest.rpartition(":")
+            if host and port.isdigit():
+                return socket.AF_INET, (host, int(port))
+
+        raise ValueError("Invalid export target %r, expected "
+                "'udp:host:port' or 'unix:path'." % target)
+
+
+    def push(self, reading):
+        """
+            Buffers a reading, sending the batch if it is full or too old.
+
+            @param: reading - the Reading to be exported.
+
+            @return: None
+        """
+        if self.__count == 0:
+            self.__first = reading.timestamp
+
+        seconds = int(reading.timestamp)
+        millis = int((reading.timestamp - seconds) * 1000)
+        self.RECORD.pack_into(self.__buffer,
+                self.HEADER.size + self.__count * self.RECORD.size,
+                seconds, millis,
+                self.__fixed(reading.temperature),
+                self.__fixed(reading.humidity))
+        self.__count += 1
+
+        if self.__count >= self.batch:
+            self.flush()
+        else:
+            self.tick(reading.timestamp)
+
+
+    def tick(self, now):
+        """
+            Sends the batch if its oldest reading has grown too old.
+
+            @param: now - the current timestamp.
+
+            @return: None
+        """
+        if self.__count and now - self.__first >= self.maxage:
+            self.flush()
+
+
+    @staticmethod
+    def __fixed(value):
+        """
+            Converts a value to hundredths, saturating to the range of a
+            signed 16-bit integer.
+
+            @param: value - the floating point value to be converted.
+
+            @return: integer value in hundredths.
+        """
+        return max(-32768, min(32767, int(round(value * 100))))
+
+
+    def flush(self):
+        """
+            Sends all buffered readings as a single batch.
+            Should the send fail, the readings are dropped and counted.
+
+            @param: None
+
+            @return: None
+        """
+        if self.__count == 0:
+            return
+
+        # whatever happens, the buffered readings are gone afterwards
+        try:
+            self.HEADER.pack_into(self.__buffer, 0, self.MAGIC, self.VERSION,
+                    self.station, self.__count, self.session, self.sequence)
+            size = self.HEADER.size + self.__count * self.RECORD.size
+
+            self.__socket.sendto(memoryview(self.__buffer)[:size],
+                    self.address)
+            self.sent += 1
+        except OSError:
+            self.dropped += self.__count
+        finally:
+            self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+            self.__count = 0
+
+
+    def close(self):
+        """
+            Sends any pending readings and closes the socket.
+
+            @param: None
+
+            @return: None
+        """
+        self.flush()
+        self.__socket.close()
@@ -0,0 +1,217 @@
+# Copyright 2014 Nashwan Azhari, Robert Krody, Tudor Vioreanu.
+# Licensed under the GPLv2, see LICENSE for details.
+
+import os, struct
+
+import Codec
+
+
+class History(object):
+    """
+        Append-only store of the raw readings of the station, compressed
+        with the Codec into blocks of a fixed number of samples.
+
+        Each block is encoded in memory as readings arrive and only written,
+        prefixed by its length, once full, which keeps writes to the SD card
+        few and small. Readings of a block not yet written are lost should
+        the station lose power; a block torn by a power loss whilst being
+        written is cut off the file when it is next opened.
+
+        Example usage:
+        >>> from History import History
+        >>>
+        >>> history = History("/var/lib/pi-sense/history.bin", block=600)
+        >>> history.append(reading)
+        >>> history.close()
+        >>>
+        >>> for timestamp, rawt, rawh in History.read(
+        ...         "/var/lib/pi-sense/history.bin"):
+        ...     print(timestamp, rawt, rawh)
+    """
+
+    LENGTH = struct.Struct("<I")
+
+
+    def __init__(self, path, block=600, resolution=1000):
+        """
+            Instantiates a History appending to the given file.
+
+            @param: path - path to the history file.
+
+            @param: block - number of samples per block.
+                default = 600
+
+            @param: resolution - resolution of the stored timestamps, in ms.
+                default = 1000
+
+            @raise: ValueError - if the block size or resolution does not fit
+                the header of a block.
+        """
+        # both are stored as 16 bit fields of the header of each block
+        if not 1 <= block <= 65535:
+            raise ValueError("Invalid history block %r, expected 1..65535." %
+                    block)
+        if not 1 <= resolution <= 65535:
+            raise ValueError("Invalid history resolution %r, expected "
+                    "1..65535." % resolution)
+
+        self.path = path
+        self.block = block
+        self.resolution = resolution
+
+        # drop whatever was written of a block torn by a power loss, lest
+        # the blocks appended from now on be misread
+        end = self.recover(path) if os.path.exists(path) else 0
+
+        self.__file = open(path, "ab")
+        self.__encoder = None
+
+        if end < self.__file.tell():
+            print("Cutting a torn block off history file %r." % path)
+            self.__file.truncate(end)
+
+
+    def append(self, reading):
+        """
+            Adds a reading, writing its block out if it is full.
+
+            @param: reading - the Reading to be stored.
+
+            @return: None
+        """
+        if self.__encoder is None:
+            self.__encoder = Codec.Encoder(self.resolution)
+
+        self.__encoder.append(reading.timestamp, reading.rawt, reading.rawh)
+        if self.__encoder.count >= self.block:
+            self.flush()
+
+
+    def flush(self):
+        """
+            Writes out the current block, even if not full.
+
+            @param: None
+
+            @return: None
+        """
+        if self.__encoder is None:
+            return
+
+        block = self.__encoder.finish()
+        self.__file.write(self.LENGTH.pack(len(block)) + block)
+        self.__file.flush()
+        self.__encoder = None
+
+
+    def close(self):
+        """
+            Writes out the current block and closes the file.
+
+            @param: None
+
+            @return: None
+        """
+        self.flush()
+        self.__file.close()
+
+
+    @classmethod
+    def __complete(cls, f):
+        """
+            Iterates over the complete blocks of an open history file,
+            stopping at the first torn one.
+
+            @param: f - the file, opened for binary reading.
+
+            @return: generator of the bytes of each block along with the
+                offset right after it.
+        """
+        while True:
+            prefix = f.read(cls.LENGTH.size)
+            if len(prefix) < cls.LENGTH.size:
+                return
+
+            length = cls.LENGTH.unpack(prefix)[0]
+            block = f.read(length)
+            if len(block) < length or not block.startswith(Codec.MAGIC):
+                return
+            yield block, f.tell()
+
+
+    @classmethod
+    def blocks(cls, path):
+        """
+            Iterates over the encoded blocks of a history file.
+
+            @param: path - path to the history file.
+
+            @return: generator of the bytes of each block.
+        """
+        with open(path, "rb") as f:
+            for block, end in cls.__complete(f):
+                yield block
+
+
+    @classmethod
+    def recover(cls, path):
+        """
+            Finds where the complete blocks of a history file end.
+
+            @param: path - path to the history file.
+
+            @return: the offset right after the last complete block.
+
+            @raise: ValueError - if the file does not start with a block,
+                and is thus no history file.
+        """
+        end = 0
+        with open(path, "rb") as f:
+            for block, end in cls.__complete(f):
+                pass
+            size = f.seek(0, os.SEEK_END)
+
+        if end == 0 and size >= cls.LENGTH.size + len(Codec.MAGIC) and \
+                not cls.ishistory(path):
+            raise ValueError("%r is not a history file." % path)
+        return end
+
+
+    @classmethod
+    def read(cls, path, start=None, end=None):
+        """
+            Iterates over the samples of a history file.
+
+            @param: path - path to the history file.
+
+            @param: start, end - timestamps bounding the returned samples,
+                None for no bound.
+                default = None
+
+            @return: generator of (timestamp, raw temperature, raw humidity).
+        """
+        for block in cls.blocks(path):
+            timestamps, rawts, rawhs = Codec.decode(block)
+            if end is not None and timestamps[0] > end:
+                return
+            if start is not None and timestamps[-1] < start:
+                continue
+
+            for sample in zip(timestamps, rawts, rawhs):
+                if (start is None or sample[0] >= start) and \
+                        (end is None or sample[0] <= end):
+                    yield sample
+
+
+    @classmethod
+    def ishistory(cls, path):
+        """
+            Tells whether a file is a history file.
+
+            @param: path - path to the file.
+
+            @return: True if the file starts with an encoded block.
+        """
+        with open(path, "rb") as f:
+            head = f.read(cls.LENGTH.size + len(Codec.MAGIC))
+        return head[cls.LENGTH.size:] == Codec.MAGIC
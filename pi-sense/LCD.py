@@ -10,7 +10,7 @@ class LCD(object):
         An object-wrapper that models our LCD (Adafruit PI-Shield 16x2 LCD).
 
         Allows for creation of the LCD object and direct use of its
-        writeline(str message) method.
+        writeline(str message) and writebytes(bytes data) methods.
 
         All apparent "magic constants" present in the code below have a direct
         explanation in the datasheet of our particular model of LCD that may be
@@ -24,6 +24,7 @@ class LCD(object):
         >>>
         >>> lcd.writeline("First line.", line=1)
         >>> lcd.writeline("Second line.", line=2)
+        >>> lcd.writebytes(b"Raw bytes.", line=1)
         >>> lcd.clear()
     """
 
@@ -216,14 +217,34 @@ class LCD(object):
 
             @return: None
         """
+        self.writebytes(message.encode("latin-1", "replace"), line)
+
+
+    def writebytes(self, data, line=1):
+        """
+            Writes already encoded characters to a line of the LCD, without
+            any per-character conversion.
+            If line width exceeds 16 characters, the output will not be wrapped.
+
+            @param: data - bytes-like object (e.g. a bytearray) holding the
+                character codes to be written.
+
+            @param: line - the line at which we wish to write to, as for
+                writeline().
+
+            @return: None
+        """
         self.__regmode("instr")
         if line != 2:
             self.__writebyte(self.__line1)
         else:
             self.__writebyte(self.__line2)
 
-        # write the message to the LCD, byte by byte
+        # write the data to the LCD, byte by byte
         self.__regmode("data")
 
-        for char in message:
-            self.__writebyte(ord(char))
+        # indexed rather than iterated, as an iterator would be allocated
+        index = 0
+        while index < len(data):
+            self.__writebyte(data[index])
+            index += 1
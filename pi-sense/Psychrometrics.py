@@ -0,0 +1,279 @@
+# Copyright 2014 Nashwan Azhari, Robert Krody, Tudor Vioreanu.
+# Licensed under the GPLv2, see LICENSE for details.
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Psychrometrics(object):
+    """
+        Computes the metrics derived from a temperature and relative humidity
+        pair: dew point, absolute humidity and heat index.
+
+        The dew point and the saturation vapour pressure both follow the
+        Magnus formula, with the coefficients recommended in the SHT1x
+        datasheet (over water above 0°C, over ice below it). The heat index
+        follows the NWS Rothfusz regression.
+
+        Single samples are handled by the plain methods, which cost a single
+        call to math.log() or math.exp() each: in CPython, that is cheaper
+        than interpolating any lookup table. NumPy arrays of samples (e.g.
+        when backfilling history) are handled by the *_array methods, which
+        evaluate whole arrays at once and require NumPy.
+
+        Example usage:
+        >>> from Psychrometrics import Psychrometrics
+        >>>
+        >>> Psychrometrics.dewpoint(25.0, 60.0)
+        >>> Psychrometrics.derive(25.0, 60.0)
+        >>>
+        >>> import numpy
+        >>> temps = numpy.array([21.5, 22.0, 22.4])
+        >>> humids = numpy.array([45.0, 47.2, 50.1])
+        >>> Psychrometrics.derive_array(temps, humids)
+    """
+
+    # Magnus coefficients over water (0..50°C) and ice (-40..0°C), as
+    # given in the SHT1x datasheet
+    TN = 243.12
+    M = 17.62
+    TN_ICE = 272.62
+    M_ICE = 22.46
+
+    # saturation vapour pressure at 0°C (hPa)
+    E0 = 6.112
+
+    # absolute humidity constant (g * K / m^3 / hPa)
+    AH = 216.7
+
+    # relative humidity range (%RH)
+    HMIN = 0.1
+    HMAX = 100.0
+
+
+    @classmethod
+    def saturation(cls, temp):
+        """
+            Returns the saturation vapour pressure at the given temperature.
+
+            @param: temp - temperature (°C).
+
+            @return: floating point pressure (hPa).
+        """
+        if temp < 0.0:
+            return cls.E0 * math.exp(cls.M_ICE * temp / (cls.TN_ICE + temp))
+        return cls.E0 * math.exp(cls.M * temp / (cls.TN + temp))
+
+
+    @classmethod
+    def dewpoint(cls, temp, humid):
+        """
+            Returns the dew point (frost point below 0°C).
+
+            @param: temp - temperature (°C).
+
+            @param: humid - relative humidity (%RH).
+
+            @return: floating point dew point (°C).
+        """
+        if temp < 0.0:
+            m, tn = cls.M_ICE, cls.TN_ICE
+        else:
+            m, tn = cls.M, cls.TN
+
+        if humid > cls.HMAX:
+            humid = cls.HMAX
+        elif humid < cls.HMIN:
+            humid = cls.HMIN
+        gamma = math.log(humid / 100.0) + m * temp / (tn + temp)
+        return tn * gamma / (m - gamma)
+
+
+    @classmethod
+    def absolute(cls, temp, humid):
+        """
+            Returns the absolute humidity.
+
+            @param: temp - temperature (°C).
+
+            @param: humid - relative humidity (%RH).
+
+            @return: floating point absolute humidity (g/m^3).
+        """
+        if temp < 0.0:
+            m, tn = cls.M_ICE, cls.TN_ICE
+        else:
+            m, tn = cls.M, cls.TN
+
+        if humid > cls.HMAX:
+            humid = cls.HMAX
+        elif humid < 0.0:
+            humid = 0.0
+        return cls.AH * cls.E0 / 100.0 * humid * \
+                math.exp(m * temp / (tn + temp)) / (273.15 + temp)
+
+
+    @classmethod
+    def heatindex(cls, temp, humid):
+        """
+            Returns the heat index, as computed by the NWS Rothfusz regression
+            and its low humidity and high humidity adjustments.
+
+            @param: temp - temperature (°C).
+
+            @param: humid - relative humidity (%RH).
+
+            @return: floating point heat index (°C).
+        """
+        t = temp * 1.8 + 32.0
+        rh = humid
+        if rh > cls.HMAX:
+            rh = cls.HMAX
+        elif rh < 0.0:
+            rh = 0.0
+
+        result = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+        if (result + t) / 2.0 >= 80.0:
+            result = (-42.379 + 2.04901523 * t + 10.14333127 * rh -
+                    0.22475541 * t * rh - 0.00683783 * t * t -
+                    0.05481717 * rh * rh + 0.00122874 * t * t * rh +
+                    0.00085282 * t * rh * rh - 0.00000199 * t * t * rh * rh)
+
+            if rh < 13.0 and 80.0 <= t <= 112.0:
+                result -= (13.0 - rh) / 4.0 * \
+                        math.sqrt((17.0 - abs(t - 95.0)) / 17.0)
+            elif rh > 85.0 and 80.0 <= t <= 87.0:
+                result += (rh - 85.0) / 10.0 * (87.0 - t) / 5.0
+
+        return (result - 32.0) / 1.8
+
+
+    @classmethod
+    def derive(cls, temp, humid):
+        """
+            Computes all derived metrics of a single sample.
+
+            @param: temp - temperature (°C).
+
+            @param: humid - relative humidity (%RH).
+
+            @return: tuple of the dew point (°C), absolute humidity (g/m^3)
+                and heat index (°C).
+        """
+        return (cls.dewpoint(temp, humid), cls.absolute(temp, humid),
+                cls.heatindex(temp, humid))
+
+
+    @staticmethod
+    def __numpy():
+        """
+            Checks that NumPy is available for array evaluation.
+
+            @param: None
+
+            @return: None
+        """
+        if numpy is None:
+            raise RuntimeError("NumPy is required for array evaluation.")
+
+
+    @classmethod
+    def dewpoint_array(cls, temp, humid):
+        """
+            Vectorized counterpart of dewpoint().
+
+            @param: temp - array of temperatures (°C).
+
+            @param: humid - array of relative humidities (%RH).
+
+            @return: array of dew points (°C).
+        """
+        cls.__numpy()
+        temp = numpy.asarray(temp, dtype=float)
+        humid = numpy.clip(numpy.asarray(humid, dtype=float), cls.HMIN,
+                cls.HMAX)
+
+        ice = temp < 0.0
+        m = numpy.where(ice, cls.M_ICE, cls.M)
+        tn = numpy.where(ice, cls.TN_ICE, cls.TN)
+
+        gamma = numpy.log(humid / 100.0) + m * temp / (tn + temp)
+        return tn * gamma / (m - gamma)
+
+
+    @classmethod
+    def absolute_array(cls, temp, humid):
+        """
+            Vectorized counterpart of absolute().
+
+            @param: temp - array of temperatures (°C).
+
+            @param: humid - array of relative humidities (%RH).
+
+            @return: array of absolute humidities (g/m^3).
+        """
+        cls.__numpy()
+        temp = numpy.asarray(temp, dtype=float)
+        humid = numpy.clip(numpy.asarray(humid, dtype=float), 0.0, cls.HMAX)
+
+        ice = temp < 0.0
+        m = numpy.where(ice, cls.M_ICE, cls.M)
+        tn = numpy.where(ice, cls.TN_ICE, cls.TN)
+
+        esat = cls.E0 * numpy.exp(m * temp / (tn + temp))
+        return cls.AH * humid / 100.0 * esat / (273.15 + temp)
+
+
+    @classmethod
+    def heatindex_array(cls, temp, humid):
+        """
+            Vectorized counterpart of heatindex().
+
+            @param: temp - array of temperatures (°C).
+
+            @param: humid - array of relative humidities (%RH).
+
+            @return: array of heat indices (°C).
+        """
+        cls.__numpy()
+        t = numpy.asarray(temp, dtype=float) * 1.8 + 32.0
+        rh = numpy.clip(numpy.asarray(humid, dtype=float), 0.0, cls.HMAX)
+
+        simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+        full = (-42.379 + 2.04901523 * t + 10.14333127 * rh -
+                0.22475541 * t * rh - 0.00683783 * t * t -
+                0.05481717 * rh * rh + 0.00122874 * t * t * rh +
+                0.00085282 * t * rh * rh - 0.00000199 * t * t * rh * rh)
+
+        dry = (rh < 13.0) & (t >= 80.0) & (t <= 112.0)
+        full = full - numpy.where(dry, (13.0 - rh) / 4.0 * numpy.sqrt(
+                numpy.clip(17.0 - numpy.abs(t - 95.0), 0.0, None) / 17.0),
+                0.0)
+
+        wet = (rh > 85.0) & (t >= 80.0) & (t <= 87.0)
+        full = full + numpy.where(wet, (rh - 85.0) / 10.0 * (87.0 - t) / 5.0,
+                0.0)
+
+        result = numpy.where((simple + t) / 2.0 >= 80.0, full, simple)
+        return (result - 32.0) / 1.8
+
+
+    @classmethod
+    def derive_array(cls, temp, humid):
+        """
+            Computes all derived metrics of arrays of samples.
+
+            @param: temp - array of temperatures (°C).
+
+            @param: humid - array of relative humidities (%RH).
+
+            @return: tuple of the dew point (°C), absolute humidity (g/m^3)
+                and heat index (°C) arrays.
+        """
+        return (cls.dewpoint_array(temp, humid),
+                cls.absolute_array(temp, humid),
+                cls.heatindex_array(temp, humid))
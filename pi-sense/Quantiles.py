@@ -0,0 +1,549 @@
+# Copyright 2014 Nashwan Azhari, Robert Krody, Tudor Vioreanu.
+# Licensed under the GPLv2, see LICENSE for details.
+
+import argparse, math, os, random, struct
+
+
+class KLL(object):
+    """
+        Streaming quantile sketch after Karnin, Lang and Liberty ("Optimal
+        Quantile Approximation in Streams", 2016).
+
+        Values are kept in a hierarchy of compactors, those on level h
+        standing for 2^h values each. Whenever the sketch outgrows its
+        capacity, a full compactor is sorted and every other of its values,
+        starting from a random offset, is promoted to the next level. Memory
+        is thus bounded by roughly 3k values regardless of the number of
+        values seen, and two sketches of the same k may be merged into one
+        that is as accurate as if it had seen both streams.
+
+        Accuracy is given as an error on the rank: with the default k = 200,
+        the true rank of the value returned for a quantile q lies within
+        about ±1.65% of q with 99% confidence (so that the returned p99 lies
+        between the true p97.35 and p100). The error scales as 1/k, and is
+        zero until the first compaction, i.e. for the first ~k values.
+
+        Example usage:
+        >>> from Quantiles import KLL
+        >>>
+        >>> sketch = KLL()
+        >>> for value in values:
+        ...     sketch.update(value)
+        >>> sketch.quantiles([0.5, 0.95, 0.99])
+    """
+
+    # serialization: magic | version | k | count | levels, then per level
+    # its number of values followed by the values themselves
+    MAGIC = b"PSKL"
+    VERSION = 1
+    HEADER = struct.Struct("<4sBHQB")
+    LEVEL = struct.Struct("<I")
+
+    # ratio between the capacities of consecutive compactors
+    C = 2.0 / 3.0
+
+
+    def __init__(self, k=200):
+        """
+            Instantiates an empty sketch.
+
+            @param: k - accuracy parameter, the capacity of the top compactor.
+                default = 200
+        """
+        self.k = k
+        self.n = 0
+        self.compactors = []
+
+        self.__size = 0
+        self.__maxsize = 0
+        self.__random = random.Random()
+
+        self.__grow()
+
+
+    def __capacity(self, height):
+        """
+            Returns the capacity of the compactor at the given height.
+
+            @param: height - the level of the compactor, 0 being the lowest.
+
+            @return: the maximum number of values on that level.
+        """
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(self.k * self.C ** depth)) + 1
+
+
+    def __grow(self):
+        """
+            Adds a compactor on top of the others, recomputing the capacity
+            of the whole sketch.
+
+            @param: None
+
+            @return: None
+        """
+        self.compactors.append([])
+        self.__maxsize = sum(self.__capacity(h)
+                for h in range(len(self.compactors)))
+
+
+    def __compress(self):
+        """
+            Compacts the lowest full compactors until the sketch is within
+            its capacity again.
+
+            @param: None
+
+            @return: None
+        """
+        while self.__size >= self.__maxsize:
+            for height, items in enumerate(self.compactors):
+                if len(items) < self.__capacity(height):
+                    continue
+
+                if height + 1 == len(self.compactors):
+                    self.__grow()
+
+                items.sort()
+                # keep one value back if odd, so that no weight is lost
+                keep = items[-1:] if len(items) % 2 else []
+                offset = self.__random.getrandbits(1)
+                self.compactors[height + 1].extend(
+                        items[offset:len(items) - len(keep):2])
+                self.compactors[height] = keep
+
+                self.__size = sum(len(c) for c in self.compactors)
+                break
+
+
+    def update(self, value):
+        """
+            Adds a value to the sketch.
+
+            @param: value - the value to be added.
+
+            @return: None
+        """
+        self.compactors[0].append(value)
+        self.n += 1
+        self.__size += 1
+
+        if self.__size >= self.__maxsize:
+            self.__compress()
+
+
+    def merge(self, other):
+        """
+            Merges another sketch into this one.
+
+            @param: other - the KLL to be merged, which must have the same k.
+
+            @return: None
+        """
+        if other.k != self.k:
+            raise ValueError("Cannot merge sketches of k %d and %d." %
+                    (self.k, other.k))
+
+        while len(self.compactors) < len(other.compactors):
+            self.__grow()
+
+        for height, items in enumerate(other.compactors):
+            self.compactors[height].extend(items)
+
+        self.n += other.n
+        self.__size = sum(len(c) for c in self.compactors)
+        self.__compress()
+
+
+    def quantiles(self, qs):
+        """
+            Returns the approximate values at the given quantiles.
+
+            @param: qs - iterable of quantiles, each within [0, 1].
+
+            @return: list of the values, None for each if the sketch is empty.
+        """
+        qs = list(qs)
+        if self.n == 0:
+            return [None] * len(qs)
+
+        weighted = sorted((value, 1 << height)
+                for height, items in enumerate(self.compactors)
+                for value in items)
+
+        results = []
+        for q in qs:
+            target = q * self.n
+            total = 0
+            for value, weight in weighted:
+                total += weight
+                if total >= target:
+                    break
+            results.append(value)
+
+        return results
+
+
+    def quantile(self, q):
+        """
+            Returns the approximate value at the given quantile.
+
+            @param: q - the quantile, within [0, 1].
+
+            @return: the value, or None if the sketch is empty.
+        """
+        return self.quantiles([q])[0]
+
+
+    def to_bytes(self):
+        """
+            Serializes the sketch. Values are stored as single precision
+            floats, which is far finer than the resolution of the sensor.
+
+            @param: None
+
+            @return: bytes representation of the sketch.
+        """
+        parts = [self.HEADER.pack(self.MAGIC, self.VERSION, self.k, self.n,
+                len(self.compactors))]
+        for items in self.compactors:
+            parts.append(self.LEVEL.pack(len(items)))
+            parts.append(struct.pack("<%df" % len(items), *items))
+
+        return b"".join(parts)
+
+
+    @classmethod
+    def from_bytes(cls, data, offset=0):
+        """
+            Deserializes a sketch.
+
+            @param: data - bytes produced by to_bytes().
+
+            @param: offset - where the sketch starts within data.
+                default = 0
+
+            @return: tuple of the KLL and the offset right after it.
+        """
+        magic, version, k, n, levels = cls.HEADER.unpack_from(data, offset)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("Not a serialized sketch.")
+        offset += cls.HEADER.size
+
+        sketch = cls(k)
+        while len(sketch.compactors) < levels:
+            sketch.__grow()
+
+        for height in range(levels):
+            count = cls.LEVEL.unpack_from(data, offset)[0]
+            offset += cls.LEVEL.size
+            sketch.compactors[height] = list(struct.unpack_from(
+                    "<%df" % count, data, offset))
+            offset += 4 * count
+
+        sketch.n = n
+        sketch.__size = sum(len(c) for c in sketch.compactors)
+        return sketch, offset
+
+
+class Quantiles(object):
+    """
+        Keeps a KLL sketch per metric and per fixed-length time bucket,
+        updated with every reading, so that percentiles over any range of
+        buckets may be queried in bounded memory.
+
+        Buckets which ended more than keep seconds ago are rolled up into
+        coarser buckets of rollup seconds, which are in turn dropped once
+        they ended more than horizon seconds ago. Each sketch serializes to
+        at most about 2.5 KB with the default k, so that the store, and its
+        file, stay within roughly
+            metrics * (keep / bucket + horizon / rollup + 2) * 2.5 KB
+        e.g. 5 * (30 + 24 + 2) * 2.5 KB = 700 KB with the defaults of the
+        station. Without keep, buckets are neither rolled up nor dropped,
+        and the store grows by a sketch per metric per bucket.
+
+        The whole store may be saved to a file and merged with others, be
+        they from a previous run or from another station, even of other
+        bucket lengths; the accuracy of the merged sketches is that of a
+        single KLL (see above).
+
+        Example usage:
+        >>> from Quantiles import Quantiles
+        >>>
+        >>> store = Quantiles(["temperature", "humidity"], bucket=86400,
+        ...         keep=30 * 86400, rollup=30 * 86400, horizon=730 * 86400)
+        >>> store.update(reading)
+        >>> store.query("temperature", [0.5, 0.95, 0.99])
+        >>> store.save("/var/lib/pi-sense/quantiles.bin")
+
+        Stored files may be queried, and merged, from the command line:
+            python Quantiles.py station1.bin station2.bin -m temperature
+    """
+
+    # serialization: magic | version | bucket length | k | entries, then
+    # per entry the metric name, the bucket start, the bucket length and
+    # the sketch (version 1 entries lack the length, that of the header)
+    MAGIC = b"PSQS"
+    VERSION = 2
+    HEADER = struct.Struct("<4sBIHI")
+    ENTRY = struct.Struct("<B")
+    START = struct.Struct("<q")
+    LENGTH = struct.Struct("<I")
+
+
+    def __init__(self, metrics, bucket=86400, k=200, keep=None, rollup=None,
+            horizon=None):
+        """
+            Instantiates an empty store.
+
+            @param: metrics - names of the Reading fields to be sketched.
+
+            @param: bucket - length of the time buckets in seconds.
+                default = 86400
+
+            @param: k - accuracy parameter of the sketches.
+                default = 200
+
+            @param: keep - seconds after their end during which buckets are
+                kept as they are, None to never roll them up.
+                default = None
+
+            @param: rollup - length in seconds of the coarser buckets, None
+                for 30 buckets.
+                default = None
+
+            @param: horizon - seconds after their end during which rolled up
+                buckets are kept, None to keep them forever.
+                default = None
+        """
+        self.metrics = list(metrics)
+        self.bucket = bucket
+        self.k = k
+        self.keep = keep
+        self.rollup = rollup if rollup is not None else 30 * bucket
+        self.horizon = horizon
+
+        # (metric, bucket start, bucket length) -> KLL
+        self.sketches = {}
+
+        self.__current = None
+
+
+    def __sketch(self, metric, start, length):
+        """
+            Returns the sketch of a bucket, creating it if need be.
+
+            @param: metric - the name of the metric.
+
+            @param: start - the start of the bucket.
+
+            @param: length - the length of the bucket.
+
+            @return: the KLL of the bucket.
+        """
+        sketch = self.sketches.get((metric, start, length))
+        if sketch is None:
+            sketch = self.sketches[(metric, start, length)] = KLL(self.k)
+        return sketch
+
+
+    def update(self, reading):
+        """
+            Adds each sketched metric of a reading to its bucket, expiring
+            old buckets whenever a new one starts.
+
+            @param: reading - the Reading to be added.
+
+            @return: None
+        """
+        start = int(reading.timestamp // self.bucket) * self.bucket
+        if start != self.__current:
+            self.__current = start
+            self.expire(reading.timestamp)
+
+        for metric in self.metrics:
+            self.__sketch(metric, start, self.bucket).update(
+                    getattr(reading, metric))
+
+
+    def expire(self, now):
+        """
+            Rolls up the buckets which ended more than keep seconds ago, and
+            drops the rolled up ones which ended more than horizon seconds
+            ago.
+
+            @param: now - the current timestamp.
+
+            @return: None
+        """
+        if self.keep is None:
+            return
+
+        for key in sorted(self.sketches):
+            metric, start, length = key
+            if length != self.rollup and start + length <= now - self.keep:
+                coarse = int(start // self.rollup) * self.rollup
+                self.__sketch(metric, coarse, self.rollup).merge(
+                        self.sketches.pop(key))
+
+        if self.horizon is None:
+            return
+
+        for key in sorted(self.sketches):
+            metric, start, length = key
+            if length == self.rollup and start + length <= now - self.horizon:
+                del self.sketches[key]
+
+
+    def query(self, metric, qs=(0.5, 0.95, 0.99), start=None, end=None):
+        """
+            Returns the quantiles of a metric over a range of buckets.
+
+            @param: metric - the name of the metric.
+
+            @param: qs - iterable of quantiles, each within [0, 1].
+                default = (0.5, 0.95, 0.99)
+
+            @param: start, end - timestamps bounding the buckets taken into
+                account, None for no bound.
+                default = None
+
+            @return: list of the values, None for each if there is no data.
+        """
+        merged = KLL(self.k)
+        for (name, bucket, length), sketch in self.sketches.items():
+            if name != metric:
+                continue
+            if start is not None and bucket + length <= start:
+                continue
+            if end is not None and bucket >= end:
+                continue
+            merged.merge(sketch)
+
+        return merged.quantiles(qs)
+
+
+    def merge(self, other):
+        """
+            Merges another store into this one.
+
+            @param: other - the Quantiles to be merged, which must have the
+                same k. Its buckets are kept at their own length, and expire
+                along with those of this store.
+
+            @return: None
+        """
+        if other.k != self.k:
+            raise ValueError("Cannot merge stores of different accuracy.")
+
+        for (metric, start, length), sketch in other.sketches.items():
+            self.__sketch(metric, start, length).merge(sketch)
+            if metric not in self.metrics:
+                self.metrics.append(metric)
+
+
+    def to_bytes(self):
+        """
+            Serializes the store.
+
+            @param: None
+
+            @return: bytes representation of the store.
+        """
+        parts = [self.HEADER.pack(self.MAGIC, self.VERSION, self.bucket,
+                self.k, len(self.sketches))]
+        for (metric, start, length), sketch in sorted(self.sketches.items()):
+            name = metric.encode("ascii")
+            parts.append(self.ENTRY.pack(len(name)) + name)
+            parts.append(self.START.pack(start))
+            parts.append(self.LENGTH.pack(length))
+            parts.append(sketch.to_bytes())
+
+        return b"".join(parts)
+
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+            Deserializes a store.
+
+            @param: data - bytes produced by to_bytes().
+
+            @return: the Quantiles.
+        """
+        magic, version, bucket, k, entries = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version not in [1, cls.VERSION]:
+            raise ValueError("Not a serialized quantile store.")
+        offset = cls.HEADER.size
+
+        store = cls([], bucket, k)
+        for i in range(entries):
+            length = cls.ENTRY.unpack_from(data, offset)[0]
+            offset += cls.ENTRY.size
+            metric = data[offset:offset + length].decode("ascii")
+            offset += length
+            start = cls.START.unpack_from(data, offset)[0]
+            offset += cls.START.size
+            length = bucket
+            if version > 1:
+                length = cls.LENGTH.unpack_from(data, offset)[0]
+                offset += cls.LENGTH.size
+
+            store.sketches[(metric, start, length)], offset = \
+                    KLL.from_bytes(data, offset)
+            if metric not in store.metrics:
+                store.metrics.append(metric)
+
+        return store
+
+
+    def save(self, path):
+        """
+            Writes the store to a file, replacing it atomically.
+
+            @param: path - the path of the file.
+
+            @return: None
+        """
+        temp = path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(temp, path)
+
+
+    @classmethod
+    def load(cls, path):
+        """
+            Reads a store from a file.
+
+            @param: path - the path of the file.
+
+            @return: the Quantiles.
+        """
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+",
+                        help="Stored quantile files, merged together")
+    parser.add_argument("-m", "--metric", action="append", default=None,
+                        help="Metric to query (default: all stored metrics)")
+    parser.add_argument("-s", "--start", default=None, type=float,
+                        help="Start timestamp of the queried range")
+    parser.add_argument("-e", "--end", default=None, type=float,
+                        help="End timestamp of the queried range")
+    args = parser.parse_args()
+
+    store = Quantiles.load(args.files[0])
+    for path in args.files[1:]:
+        store.merge(Quantiles.load(path))
+
+    for metric in args.metric or store.metrics:
+        p50, p95, p99 = store.query(metric, start=args.start, end=args.end)
+        if p50 is None:
+            print("%s: no data" % metric)
+        else:
+            print("%s: p50 %.2f  p95 %.2f  p99 %.2f" % (metric, p50, p95,
+                    p99))
@@ -0,0 +1,246 @@
+# Copyright 2014 Nashwan Azhari, Robert Krody, Tudor Vioreanu.
+# Licensed under the GPLv2, see LICENSE for details.
+
+import math
+
+
+class Renderer(object):
+    """
+        Renders readings into preallocated line buffers for the LCD.
+
+        Each value is written as fixed-point with two decimals, followed by
+        its unit, and centered on the line exactly as str.center() would, so
+        that the layout is that of "%.2f %s" % (value, unit) centered. As
+        with "%.2f", the exact binary value is rounded, halves to even, and
+        non-finite values are written as nan, inf or -inf.
+
+        Rendering allocates nothing once warmed up: the arithmetic is done on
+        floats, recycled by the interpreter, and on the small integers it
+        keeps cached, with the hundredths of the value computed exactly from
+        its split into halves which multiply by 100 exactly. The digits are
+        looked up in a table and written straight into the buffers, which are
+        handed as they are to LCD.writebytes(). Only values beyond FAST
+        (which do not fit on the screen anyway) are formatted with "%.2f",
+        which allocates.
+
+        Should a rendered value not fit on the line, it is cut at the width
+        of the screen.
+
+        Example usage:
+        >>> from Renderer import Renderer
+        >>>
+        >>> renderer = Renderer({"temperature": "(C)"}, width=16)
+        >>> if renderer.render(1, 23.456, "temperature"):
+        ...     lcd.writebytes(renderer.lines[0], line=1)
+    """
+
+    # largest magnitude rendered without allocating; below it, 100 times
+    # the value is below 2^50, so that halves are multiples of its ulp
+    FAST = 1e13
+
+    # Veltkamp splitting factor (2^27 + 1) of doubles
+    __split = 134217729.0
+
+    __digits = b"0123456789"
+    __space = ord(" ")
+    __point = ord(".")
+    __minus = ord("-")
+
+
+    def __init__(self, units, width=16):
+        """
+            Instantiates a Renderer and its line buffers.
+
+            @param: units - dict of metric name to the unit it is shown with.
+
+            @param: width - the width of the screen, in characters.
+                default = 16
+        """
+        self.width = width
+        self.lines = [bytearray(b" " * width), bytearray(b" " * width)]
+
+        # the units, encoded once along with their leading space
+        self.__suffixes = dict((metric, (" " + unit).encode("latin-1"))
+                for metric, unit in units.items())
+
+        self.__scratch = bytearray(width)
+        self.__valid = [False, False]
+
+
+    def __put(self, pos, byte):
+        """
+            Writes a character into the scratch buffer, if within the line.
+
+            @param: pos - position of the character on the line.
+
+            @param: byte - the character code.
+
+            @return: None
+        """
+        if 0 <= pos < self.width:
+            self.__scratch[pos] = byte
+
+
+    def __start(self, length):
+        """
+            Blanks the scratch buffer for a rendered text of the given length.
+
+            @param: length - the length of the text, in characters.
+
+            @return: the position of the text, centered as str.center() does.
+        """
+        pos = 0
+        while pos < self.width:
+            self.__scratch[pos] = self.__space
+            pos += 1
+
+        margin = self.width - length
+        if margin <= 0:
+            return 0
+        return margin // 2 + (margin & self.width & 1)
+
+
+    def __text(self, pos, text):
+        """
+            Writes characters into the scratch buffer, cutting them at the
+            width of the line.
+
+            @param: pos - position of the first character on the line.
+
+            @param: text - bytes-like object of the characters.
+
+            @return: the position right after the text.
+        """
+        index = 0
+        while index < len(text):
+            self.__put(pos + index, text[index])
+            index += 1
+        return pos + len(text)
+
+
+    def __hundredths(self, value):
+        """
+            Rounds the magnitude of a value to hundredths as "%.2f" does,
+            the exact product by 100 being rounded, halves to even.
+
+            @param: value - the finite value, of magnitude below FAST.
+
+            @return: the rounded number of hundredths, as an integral float.
+        """
+        value = abs(value)
+
+        # split the value in two halves of 26 bits, so that each multiplies
+        # by 100 exactly, then add both products keeping the rounding error
+        big = self.__split * value
+        high = big - (big - value)
+        low = value - high
+        high *= 100.0
+        low *= 100.0
+        scaled = high + low
+        error = low - (scaled - high)
+
+        # round scaled + error, looking at how its fractional part compares
+        # with a half, exactly
+        floor = scaled - math.fmod(scaled, 1.0)
+        half = (scaled - floor) - 0.5
+        if half > 0.0 or (half == 0.0 and (error > 0.0 or (error == 0.0 and
+                math.fmod(floor, 2.0) == 1.0))):
+            return floor + 1.0
+        return floor
+
+
+    def render(self, line, value, metric):
+        """
+            Renders a value with its unit into the buffer of a line.
+
+            @param: line - the line to render into (1 or 2).
+
+            @param: value - the floating point value to be rendered.
+
+            @param: metric - the name of the metric, selecting the unit.
+
+            @return: True if the content of the line changed, in which case
+                it should be written to the LCD.
+        """
+        suffix = self.__suffixes[metric]
+        digits = self.__digits
+
+        if not math.isfinite(value):
+            if math.isnan(value):
+                word = b"nan"
+            elif value > 0.0:
+                word = b"inf"
+            else:
+                word = b"-inf"
+
+            pos = self.__start(len(word) + len(suffix))
+            pos = self.__text(pos, word)
+
+        elif abs(value) >= self.FAST:
+            text = ("%.2f" % value).encode("ascii")
+            pos = self.__start(len(text) + len(suffix))
+            pos = self.__text(pos, text)
+
+        else:
+            # like "%.2f", a sign is shown for anything rounding to -0.00
+            negative = 1 if math.copysign(1.0, value) < 0.0 else 0
+            fixed = self.__hundredths(value)
+            hundredths = math.fmod(fixed, 100.0)
+            whole = (fixed - hundredths) / 100.0
+
+            size = 1
+            rest = whole
+            while rest >= 10.0:
+                rest = (rest - math.fmod(rest, 10.0)) / 10.0
+                size += 1
+
+            pos = self.__start(negative + size + 3 + len(suffix))
+            if negative:
+                self.__put(pos, self.__minus)
+                pos += 1
+
+            end = pos + size
+            rest = whole
+            while end > pos:
+                end -= 1
+                digit = math.fmod(rest, 10.0)
+                self.__put(end, digits[int(digit)])
+                rest = (rest - digit) / 10.0
+            pos += size
+
+            tenths = math.fmod(hundredths, 10.0)
+            self.__put(pos, self.__point)
+            self.__put(pos + 1, digits[int((hundredths - tenths) / 10.0)])
+            self.__put(pos + 2, digits[int(tenths)])
+            pos += 3
+
+        self.__text(pos, suffix)
+
+        # only report the line as changed if it actually did, copying it
+        # over by hand as slicing would allocate
+        scratch = self.__scratch
+        buf = self.lines[line - 1]
+        changed = not self.__valid[line - 1]
+        pos = 0
+        while pos < self.width:
+            if buf[pos] != scratch[pos]:
+                buf[pos] = scratch[pos]
+                changed = True
+            pos += 1
+
+        self.__valid[line - 1] = True
+        return changed
+
+
+    def invalidate(self):
+        """
+            Marks the content of the LCD as unknown, e.g. after something else
+            was written on it, so that the next render of each line is
+            reported as a change.
+
+            @param: None
+
+            @return: None
+        """
+        self.__valid[0] = False
+        self.__valid[1] = False
@@ -0,0 +1,232 @@
+# Copyright 2014 Nashwan Azhari, Robert Krody, Tudor Vioreanu.
+# Licensed under the GPLv2, see LICENSE for details.
+
+import time
+
+from History import History
+
+
+class ReplayExhausted(Exception):
+    """
+        Raised by Replay.raw() once every recorded sample has been consumed.
+    """
+    pass
+
+
+class Replay(object):
+    """
+        A stand-in for the SHT11 sensor which streams previously recorded raw
+        readings from a file, so that the rest of the WeatherStation pipeline
+        (conversion, alerting, display) may be exercised on real data without
+        having to wait for it in real time.
+
+        The recording is a plain text file with one sample per line, each
+        consisting of the timestamp (seconds since the epoch) followed by the
+        raw temperature and raw humidity words, separated by whitespace.
+        Words may be given in decimal or prefixed hexadecimal notation.
+        Empty lines and lines starting with '#' are ignored:
+            # timestamp     temperature  humidity
+            1418035200.0    0x1A2B       0x05C1
+            1418035201.0    6700         1473
+
+        History files written by the station may be replayed as well.
+
+        Besides the sensor interface, a Replay also acts as the clock of the
+        station: time() returns the timestamp of the sample last read and
+        sleep() waits for the gap between the recorded samples, scaled by
+        the requested speed.
+
+        Example usage:
+        >>> from Replay import Replay
+        >>> from WeatherStation import WeatherStation
+        >>>
+        >>> # replay at ten times the recorded speed
+        >>> replay = Replay("/path/to/recording.txt", speed=10)
+        >>> ws = WeatherStation("/path/to/config/file.conf", replay=replay)
+        >>> ws.monitor(run_time=None)   # stops the replay when done
+        >>> print("%.1f samples/s" % replay.rate())
+    """
+
+    def __init__(self, path, speed=1.0):
+        """
+            Instantiates a Replay of the recording at the given path.
+
+            @param: path - path to the recording to be replayed.
+
+            @param: speed - the factor by which the recording is sped up.
+                1.0         :: replay at the recorded speed
+                x > 0       :: replay x times faster than recorded
+                0 or None   :: replay as fast as possible, without any sleeps
+                default = 1.0
+        """
+        self.path = path
+        self.speed = speed
+        self.samples = 0
+
+        if History.ishistory(path):
+            self.__file = None
+            self.__records = History.read(path)
+        else:
+            self.__file = open(path, "r")
+            self.__records = self.__parse()
+
+        # the timestamp of the last consumed record and the prefetched one
+        self.__current = None
+        self.__next = next(self.__records, None)
+
+        # wall clock and recording time anchors used for pacing
+        self.__wallstart = None
+        self.__wallend = None
+        self.__replaystart = None
+
+
+    def __parse(self):
+        """
+            Lazily parses the recording, line by line.
+
+            @param: None
+
+            @return: generator of (timestamp, raw temperature, raw humidity).
+        """
+        for lineno, line in enumerate(self.__file, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            try:
+                timestamp, rawt, rawh = line.split()
+                yield float(timestamp), int(rawt, 0), int(rawh, 0)
+            except ValueError:
+                raise ValueError("Malformed record on line %d of %r: %r" %
+                        (lineno, self.path, line))
+
+
+    def time(self):
+        """
+            Returns the current time as seen by the recording.
+
+            @param: None
+
+            @return: timestamp of the last replayed sample, or that of the
+                first one if none were replayed yet.
+        """
+        if self.__current is not None:
+            return self.__current
+        if self.__next is not None:
+            return self.__next[0]
+        return 0.0
+
+
+    def sleep(self, seconds=None):
+        """
+            Waits until the next recorded sample is due, as scaled by the
+            replay speed. The requested duration is ignored, as the period of
+            the recording is what governs the pacing of a replay.
+
+            @param: seconds - unused, kept for compatibility with time.sleep.
+
+            @return: None
+        """
+        if not self.speed or self.__next is None or self.__wallstart is None:
+            return
+
+        due = self.__wallstart + (self.__next[0] - self.__replaystart) / \
+                self.speed
+        delay = due - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+
+    def raw(self):
+        """
+            Returns the next recorded sample.
+
+            @param: None
+
+            @return: tuple of the raw temperature and raw humidity words.
+
+            @raise: ReplayExhausted - if the end of the recording was reached.
+        """
+        record = self.__next
+        if record is None:
+            raise ReplayExhausted("Recording %r exhausted after %d samples." %
+                    (self.path, self.samples))
+
+        if self.__wallstart is None:
+            self.__wallstart = time.time()
+            self.__replaystart = record[0]
+
+        self.__current = record[0]
+        self.__next = next(self.__records, None)
+        self.samples += 1
+
+        return record[1], record[2]
+
+
+    def stop(self):
+        """
+            Marks the end of the replay, once every replayed sample was
+            handled, so that rate() accounts for the time spent on them.
+
+            @param: None
+
+            @return: None
+        """
+        if self.__wallstart is not None and self.__wallend is None:
+            self.__wallend = time.time()
+
+
+    def rate(self):
+        """
+            Returns the replay throughput measured so far, until stop() was
+            called if it was.
+
+            @param: None
+
+            @return: floating point number of samples replayed per second.
+        """
+        if self.__wallstart is None:
+            return 0.0
+
+        end = self.__wallend if self.__wallend is not None else time.time()
+        elapsed = end - self.__wallstart
+        if elapsed <= 0:
+            return float(self.samples)
+        return self.samples / elapsed
+
+
+    def reset(self):
+        """
+            Resetting a recording is a no-op, present for compatibility with
+            the SHT11 interface.
+
+            @param: None
+
+            @return: None
+        """
+        pass
+
+
+    def softreset(self):
+        """
+            Resetting a recording is a no-op, present for compatibility with
+            the SHT11 interface.
+
+            @param: None
+
+            @return: None
+        """
+        pass
+
+
+    def close(self):
+        """
+            Closes the underlying recording file.
+
+            @param: None
+
+            @return: None
+        """
+        if self.__file is not None:
+            self.__file.close()
+        self.__records.close()
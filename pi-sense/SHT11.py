@@ -5,6 +5,38 @@ import time
 import RPi.GPIO as gpio
 
 
+class SensorError(Exception):
+    """
+        Base class for all errors occuring whilst communicating with the
+        sensor. The kind attribute names the type of failure and is used for
+        keeping count of the failures.
+    """
+    kind = "other"
+
+
+class AckError(SensorError):
+    """
+        Raised when the sensor fails to acknowledge a command or to release
+        the data line afterwards.
+    """
+    kind = "ack"
+
+
+class ConversionTimeoutError(SensorError):
+    """
+        Raised when the sensor fails to signal the end of a measurement in
+        due time.
+    """
+    kind = "timeout"
+
+
+class CRCError(SensorError):
+    """
+        Raised when the checksum sent by the sensor does not match the data.
+    """
+    kind = "crc"
+
+
 class SHT11(object):
     """
         This object is meant to provide an easily accesible interface to the
@@ -51,9 +83,13 @@ class SHT11(object):
     # command encodings for our sensor:
     __humcmd = 0b00000101
     __tempcmd = 0b00000011
+    __resetcmd = 0b00011110
+
+    # CRC-8 generator polynomial (x^8 + x^5 + x^4 + 1)
+    __crcpoly = 0x31
 
 
-    def __init__(self, datapin, clkpin, mode=gpio.BCM):
+    def __init__(self, datapin, clkpin, mode=gpio.BCM, crc=True):
         """
             Instanciates an object of class SHT11.
 
@@ -65,11 +101,16 @@ class SHT11(object):
                 gpio.BOARD :: board pin layout numbering scheme.
                 gpio.BCM   :: processor pin numbering scheme.
                 default = gpio.BCM
+
+            @param: crc - whether the checksum of each reading should be
+                requested from the sensor and verified.
+                default = True
         """
         gpio.setmode(mode)
 
         self.datapin = datapin
         self.clockpin = clkpin
+        self.crc = crc
 
         # the sensor has an initial startup of 11ms to reach standby mode.
         # although ludicrously unlikely for it not to be pre-initialized, we
@@ -113,6 +154,8 @@ class SHT11(object):
             @param: cmd - binary encoding of the command to be issued.
 
             @return: None
+
+            @raise: AckError - if the sensor did not acknowledge the command.
         """
         # setup the pins for output
         gpio.setup(self.datapin, gpio.OUT)
@@ -141,7 +184,7 @@ class SHT11(object):
 
         self.__tick(False)
         if gpio.input(self.datapin) != True:
-            raise Exception("Error whilst sending command \'%d\'." % (cmd))
+            raise AckError("Error whilst sending command \'%d\'." % (cmd))
 
 
     def __awaitresult(self):
@@ -155,9 +198,16 @@ class SHT11(object):
             @param: None
 
             @return: None
+
+            @raise: AckError - if the data line was not released after the
+                command was acknowledged.
+
+            @raise: ConversionTimeoutError - if the measurement did not
+                complete in due time.
         """
         gpio.setup(self.datapin, gpio.IN)
-        assert gpio.input(self.datapin) == True
+        if gpio.input(self.datapin) != True:
+            raise AckError("Data line not released after acknowledge.")
 
         # wait for 400 milliseconds to be sure
         time.sleep(4 * 10 ** -1)
@@ -165,20 +215,25 @@ class SHT11(object):
         if gpio.input(self.datapin) == False:
             return
         else:
-            raise Exception("Error occured whilst awaiting result.")
+            raise ConversionTimeoutError("Error occured whilst awaiting "
+                    "result.")
 
 
-    def __readresult(self):
+    def __readresult(self, cmd):
         """
             Read the result from the sensor.
             In 16-bit mode, the sensor will return the raw result in two
             one-byte chunks, one bit at a time, most significat first.
             After recieving a byte, we must acknowledge it by pulling data
             to 0 logic ourselves.
+            If CRC checking is enabled, the third byte sent by the sensor is
+            the checksum of the command and the two result bytes.
 
-            @param: None
+            @param: cmd - the command whose result is being read.
 
             @return: 2-byte integer representing the raw data reading.
+
+            @raise: CRCError - if the checksum does not match the result.
         """
         gpio.setup(self.datapin, gpio.IN)
         gpio.setup(self.clockpin, gpio.OUT)
@@ -187,17 +242,63 @@ class SHT11(object):
         byte1 = self.__readbyte()
 
         # acknowledge reception of firts byte
+        self.__acknowledge()
+
+        # read second byte
+        byte2 = self.__readbyte()
+
+        if self.crc:
+            self.__acknowledge()
+            checksum = self.__readbyte()
+            if checksum != self.__checksum(cmd, byte1, byte2):
+                raise CRCError("Checksum mismatch on command \'%d\'." % cmd)
+
+        result = (byte1 << 8) | byte2
+        return result
+
+
+    def __acknowledge(self):
+        """
+            Acknowledges the reception of a byte by pulling data to 0 logic
+            for a full clock cycle, after which data is released for reading.
+
+            @param: None
+
+            @return: None
+        """
         gpio.setup(self.datapin, gpio.OUT)
         gpio.output(self.datapin, True)
         gpio.output(self.datapin, False)
         self.__tick(True)
         self.__tick(False)
-
-        # read second byte
         gpio.setup(self.datapin, gpio.IN)
-        byte2 = self.__readbyte()
 
-        result = (byte1 << 8) | byte2
+
+    def __checksum(self, *data):
+        """
+            Computes the CRC-8 checksum the sensor sends for the given bytes.
+            The register starts out as the bit-reversed lower nibble of the
+            status register (0 by default), and the sensor sends the final
+            value of the register bit-reversed.
+
+            @param: data - the bytes to compute the checksum over, in the
+                order in which they were sent.
+
+            @return: the expected checksum byte.
+        """
+        crc = 0
+        for byte in data:
+            crc ^= byte
+            for i in range(8):
+                if crc & 0x80:
+                    crc = ((crc << 1) ^ self.__crcpoly) & 0xFF
+                else:
+                    crc = (crc << 1) & 0xFF
+
+        # reverse the bits of the register
+        result = 0
+        for i in range(8):
+            result = (result << 1) | ((crc >> i) & 1)
         return result
 
 
@@ -258,26 +359,113 @@ class SHT11(object):
             self.__tick(False)
 
 
-    def temperature(self):
+    def softreset(self):
         """
-            The main method of the sensor module which issues the necessary
-            command for reading the temperature and returns the result.
-            The equation of conversion from raw value to actual temperature
-            is linear and constant dependant. All corrections are done before
-            the sending of the final result.
+            Issues the soft reset command, which resets the interface and
+            restores the status register to its defaults. The sensor then
+            requires the same 11ms as on startup before it may be queried.
 
             @param: None
 
+            @return: None
+
+            @raise: AckError - if the sensor did not acknowledge the command.
+        """
+        self.__sendcmd(self.__resetcmd)
+        time.sleep(11 * (10 ** -3))
+
+
+    @classmethod
+    def convert_temperature(cls, raw):
+        """
+            Converts a raw temperature word into a temperature value.
+            The equation of conversion from raw value to actual temperature
+            is linear and constant dependant.
+
+            @param: raw - the raw temperature word read from the sensor.
+
             @return: floating point temperature value (°C).
         """
+        return raw * cls.D2 + cls.D1
+
+
+    @classmethod
+    def convert_humidity(cls, raw, temp):
+        """
+            Converts a raw humidity word into a relative humidity value,
+            applying the temperature correction on it.
+
+            @param: raw - the raw humidity word read from the sensor.
+
+            @param: temp - temperature required for humidity correction.
+
+            @return: floating point humidity value (%RH).
+        """
+        actual = cls.C1 + cls.C2 * raw + cls.C3 * raw ** 2
+        return (temp - 25.0) * (actual * cls.T2 + cls.T1) + actual
+
+
+    def raw_temperature(self):
+        """
+            Issues the temperature measurement command and returns the
+            unconverted result.
+
+            @param: None
+
+            @return: 2-byte integer representing the raw temperature word.
+        """
         self.__sendcmd(self.__tempcmd)
 
         self.__awaitresult()
-        raw = self.__readresult()
+        raw = self.__readresult(self.__tempcmd)
         self.__denyCRC()
 
-        result = raw * self.D2 + self.D1
-        return result
+        return raw
+
+
+    def raw_humidity(self):
+        """
+            Issues the humidity measurement command and returns the
+            unconverted result.
+
+            @param: None
+
+            @return: 2-byte integer representing the raw humidity word.
+        """
+        self.__sendcmd(self.__humcmd)
+
+        self.__awaitresult()
+        raw = self.__readresult(self.__humcmd)
+        self.__denyCRC()
+
+        return raw
+
+
+    def raw(self):
+        """
+            Takes a full measurement, temperature first, and returns both
+            raw words as they were read from the sensor.
+
+            @param: None
+
+            @return: tuple of the raw temperature and raw humidity words.
+        """
+        rawt = self.raw_temperature()
+        rawh = self.raw_humidity()
+        return rawt, rawh
+
+
+    def temperature(self):
+        """
+            The main method of the sensor module which issues the necessary
+            command for reading the temperature and returns the result.
+            All corrections are done before the sending of the final result.
+
+            @param: None
+
+            @return: floating point temperature value (°C).
+        """
+        return self.convert_temperature(self.raw_temperature())
 
 
     def humidity(self, temp=None):
@@ -298,12 +486,17 @@ class SHT11(object):
         if temp == None:
             temp = self.temperature()
 
-        self.__sendcmd(self.__humcmd)
+        return self.convert_humidity(self.raw_humidity(), temp)
 
-        self.__awaitresult()
-        raw = self.__readresult()
-        self.__denyCRC()
 
-        actual = self.C1 + self.C2 * raw + self.C3 * raw ** 2
-        result = (temp - 25.0) * (actual * self.T2 + self.T1) + actual
-        return result
+    def close(self):
+        """
+            Releases the sensor. The GPIO pins themselves are released by
+            gpio.cleanup(), so there is nothing left to do here; the method
+            is present for compatibility with the other sensor sources.
+
+            @param: None
+
+            @return: None
+        """
+        pass
@@ -1,14 +1,31 @@
 # Copyright 2014 Nashwan Azhari, Robert Krody, Tudor Vioreanu.
 # Licensed under the GPLv2, see LICENSE for details.
 
+from collections import namedtuple
 from configparser import ConfigParser
-import os, sys, time
+import os, struct, sys, time
 
 import RPi.GPIO as gpio
 
+from Acquisition import Acquisition
+from Bus import Bus, Subscription
+from Exporter import Exporter
+from History import History
 from LCD import LCD
 from LED import LED
-from SHT11 import SHT11
+from Psychrometrics import Psychrometrics
+from Quantiles import Quantiles
+from Renderer import Renderer
+from Replay import ReplayExhausted
+from SHT11 import SHT11, SensorError
+
+
+# a single, fully converted sample of the station
+Reading = namedtuple("Reading", ["timestamp", "rawt", "rawh", "temperature",
+        "humidity", "dewpoint", "absolute", "heatindex"])
+
+# published in place of a Reading when no reading could be obtained
+Fault = namedtuple("Fault", ["timestamp", "kind", "count"])
 
 
 class WeatherStation(object):
@@ -30,25 +47,43 @@ class WeatherStation(object):
         >>> ws.monitor(run_time=3600, frequency=5)
     """
 
-    def __init__(self, confpath="./example.conf"):
+    # the metrics of a Reading which may be displayed or alerted upon,
+    # along with the units they are displayed with
+    METRICS = {
+        "temperature": "(C)",
+        "humidity": "(RH%)",
+        "dewpoint": "(DP C)",
+        "absolute": "(g/m3)",
+        "heatindex": "(HI C)",
+    }
+
+    def __init__(self, confpath="./example.conf", replay=None):
         """
             Instantiates a WeatherStation object and all of its individual
             components.
 
             @param: confpath - absolute path to configuration file.
                 default = "./example.conf"
+
+            @param: replay - Replay to be used in place of the SHT11 sensor.
+                The replay also becomes the clock of the station.
+                default = None
         """
-        self.mode = None
-        self.warnings = None
-        self.params = {}
+        self.confpath = confpath
         self.leds = []
-        self.ledpins = {}
-        self.sensorpins = {}
+        self.exporter = None
+        self.quantiles = None
+        self.history = None
+
+        # per-kind counters of sensor failures, and whether the station is
+        # currently unable to get readings out of the sensor
+        self.errors = {"ack": 0, "timeout": 0, "crc": 0, "other": 0}
+        self.degraded = False
 
         # read through the config file
         try:
-            os.stat(confpath)
-            self.__parseconfig(confpath)
+            self.__mtime = os.stat(confpath).st_mtime_ns
+            settings = self.__parseconfig(confpath)
         except FileNotFoundError:
             print("Config file %r not found." % confpath)
             sys.exit(-1)
@@ -60,13 +95,32 @@ class WeatherStation(object):
             print(e)
             sys.exit(-1)
 
+        self.mode = settings["mode"]
+        self.warnings = settings["warnings"]
+        self.params = settings["params"]
+        self.sensorpins = settings["sensorpins"]
+        self.ledpins = settings["ledpins"]
+        self.export = settings["export"]
+        self.sketch = settings["sketch"]
+        self.store = settings["store"]
+
+        self.__backoff = self.params["backoff"]
+        self.__reload = False
+        self.__monitoring = False
+
         # set warnings
         gpio.setwarnings(self.warnings)
 
         # instantiate all components
         self.lcd = LCD(self.mode)
-        self.sensor = SHT11(self.sensorpins["data"], self.sensorpins["clock"],
-                self.mode)
+        self.renderer = Renderer(self.METRICS, self.lcd.SCREENWIDTH)
+        self.replaying = replay is not None
+        if replay is None:
+            self.sensor = self.__sensor(self.params, self.sensorpins)
+            self.clock = time
+        else:
+            self.sensor = replay
+            self.clock = replay
 
         self.status_led = LED(self.ledpins["green"], self.mode)
         self.temperature_led = LED(self.ledpins["red"], self.mode)
@@ -82,16 +136,177 @@ class WeatherStation(object):
         # write status to the screen
         self.__lcd_write("WEATHERSTATION", "OPERATIONAL")
 
+        # register the consumers of readings on the bus; those driving the
+        # hardware only care about the latest reading, whilst those keeping
+        # records must not lose any. A replay waits for all of them, so that
+        # every sample goes through the whole pipeline and its throughput
+        # is that of the slowest consumer
+        self.bus = Bus()
+        policy = Subscription.BLOCK if self.replaying else Subscription.DROP
+        self.subscribe("leds", self.__trigger_leds, 4, policy)
+        self.subscribe("lcd", self.__display, 4, policy)
+
+        # set up the optional components which are configured
+        self.__subscriptions = {}
+        for section in ["export", "sketch", "store"]:
+            self.__install(section,
+                    self.__build(section, getattr(self, section)))
+
+
+    def __build(self, section, settings):
+        """
+            Creates the optional component configured by the given section,
+            leaving the running one, if any, untouched.
+
+            @param: section - the component.
+                export :: the exporter
+                sketch :: the quantile sketches
+                store  :: the history file
+
+            @param: settings - the settings of the component, None if it is
+                not configured.
+
+            @return: the new component, None if it is not configured.
+        """
+        if settings is None:
+            return None
+
+        if section == "export":
+            return Exporter(settings["target"], settings["station"],
+                    settings["batch"], settings["maxage"])
+
+        if section == "sketch":
+            # resume from the sketches saved by this or a previous run
+            if self.quantiles is not None:
+                self.quantiles.save(self.__sketchfile)
+
+            quantiles = Quantiles(sorted(self.METRICS), settings["bucket"],
+                    settings["k"], settings["keep"], settings["rollup"],
+                    settings["horizon"])
+            if os.path.exists(settings["file"]):
+                self.__resume(quantiles, settings["file"])
+            return quantiles
+
+        return History(settings["file"], settings["block"],
+                settings["resolution"])
+
+
+    def __discard(self, section, component):
+        """
+            Closes a component made by __build() which is not to be used.
+
+            @param: section - the component, as for __build().
+
+            @param: component - the component, None if not configured.
+
+            @return: None
+        """
+        if component is not None and section != "sketch":
+            component.close()
+
+
+    def __install(self, section, component):
+        """
+            Replaces the running optional component of the given section by
+            one made by __build(), closing and unsubscribing the previous
+            one. The settings of the section must already be in place.
+
+            @param: section - the component, as for __build().
+
+            @param: component - the new component, None if not configured.
+
+            @return: None
+        """
+        subscription = self.__subscriptions.pop(section, None)
+        if subscription is not None:
+            self.bus.unsubscribe(subscription)
+
+        if section == "export":
+            if self.exporter is not None:
+                self.exporter.close()
+            self.exporter = component
+            if component is not None:
+                self.__subscriptions[section] = self.subscribe("export",
+                        self.__export, 256, Subscription.BLOCK)
+
+        elif section == "sketch":
+            if self.quantiles is not None:
+                self.quantiles.save(self.__sketchfile)
+            self.quantiles = component
+            if component is not None:
+                self.__sketchfile = self.sketch["file"]
+                self.__saved = None
+                self.__subscriptions[section] = self.subscribe("quantiles",
+                        self.__sketch, 256, Subscription.BLOCK)
+
+        elif section == "store":
+            if self.history is not None:
+                self.history.close()
+            self.history = component
+            if component is not None:
+                self.__subscriptions[section] = self.subscribe("history",
+                        self.__store, 256, Subscription.BLOCK)
+
+
+    def __resume(self, quantiles, path):
+        """
+            Merges the sketches saved by a previous run into the given store.
+            Should the saved store not be mergeable (e.g. its accuracy was
+            changed since), it is moved aside and the store starts afresh.
+
+            @param: quantiles - the Quantiles to resume.
+
+            @param: path - the file the sketches were saved to.
+
+            @return: None
+        """
+        try:
+            quantiles.merge(Quantiles.load(path))
+        except (ValueError, struct.error) as e:
+            print("Could not resume the quantile sketches from %r: %s" %
+                    (path, e))
+            print("Moving them aside to %r and starting afresh." %
+                    (path + ".old"))
+            os.replace(path, path + ".old")
+
+
+    def __sensor(self, params, sensorpins):
+        """
+            Instantiates the sensor driver, either directly or, if isolation
+            is enabled, within its own acquisition process.
+
+            @param: params - the parameters of the station.
+
+            @param: sensorpins - the pins of the sensor.
+
+            @return: the SHT11 or Acquisition instance.
+        """
+        if params["isolate"]:
+            return Acquisition(sensorpins["data"], sensorpins["clock"],
+                    self.mode, params["crc"], params["period"], params["cpu"],
+                    params["priority"])
+
+        return SHT11(sensorpins["data"], sensorpins["clock"], self.mode,
+                params["crc"])
+
 
     def __parseconfig(self, confpath):
         """
-            Parses the config file, registering all found values.
+            Parses the config file, gathering all found values.
             In case a paricular value is not present, a fallback is provided.
 
             @param: confpath - path to the configuration file
 
-            @return: none
+            @return: dict of the settings, keyed by the name of the attribute
+                they are kept in (mode, warnings, params, sensorpins, ledpins,
+                and the optional export, sketch and store, None if their
+                section is missing).
         """
+        settings = {}
+        params = {}
+        ledpins = {}
+        sensorpins = {}
+
         parser = ConfigParser()
         parser.read(confpath)
 
@@ -103,31 +318,288 @@ class WeatherStation(object):
         # get operations mode
         mode = parser["General"]["MODE"]
         if mode.lower() == "board":
-            self.mode = gpio.BOARD
+            settings["mode"] = gpio.BOARD
         else:
-            self.mode = gpio.BCM
+            settings["mode"] = gpio.BCM
 
         # get warnings setting
-        self.warnings = parser.getboolean("General", "WARNINGS", fallback=False)
+        settings["warnings"] = parser.getboolean("General", "WARNINGS",
+                fallback=False)
 
         # get operational parameters
         parameters = parser["Parameters"]
-        self.params["maxt"] = parameters.getfloat("MAX_TEMP", fallback=40.0)
-        self.params["mint"] = parameters.getfloat("MIN_TEMP", fallback=20.0)
-        self.params["maxh"] = parameters.getfloat("MAX_HUMID", fallback=70.0)
-        self.params["minh"] = parameters.getfloat("MIN_HUMID", fallback=30.0)
+        params["maxt"] = parameters.getfloat("MAX_TEMP", fallback=40.0)
+        params["mint"] = parameters.getfloat("MIN_TEMP", fallback=20.0)
+        params["maxh"] = parameters.getfloat("MAX_HUMID", fallback=70.0)
+        params["minh"] = parameters.getfloat("MIN_HUMID", fallback=30.0)
+
+        # get the metrics to be displayed and alerted upon
+        display = parameters.get("DISPLAY", fallback="temperature, humidity")
+        params["display"] = [m.strip().lower() for m in display.split(",")]
+        if len(params["display"]) != 2:
+            raise ValueError("DISPLAY must name exactly two metrics.")
+        params["alertt"] = parameters.get("ALERT_TEMP",
+                fallback="temperature").strip().lower()
+        params["alerth"] = parameters.get("ALERT_HUMID",
+                fallback="humidity").strip().lower()
+
+        for metric in params["display"] + [params["alertt"], params["alerth"]]:
+            if metric not in self.METRICS:
+                raise ValueError("Unknown metric %r, expected one of: %s." %
+                        (metric, ", ".join(sorted(self.METRICS))))
 
         # get sensor pins
-        sensorpins = parser["Sensor"]
-        self.sensorpins["data"] = sensorpins.getint("DATA", fallback=27)
-        self.sensorpins["clock"] = sensorpins.getint("CLOCK", fallback=4)
+        sensor = parser["Sensor"]
+        sensorpins["data"] = sensor.getint("DATA", fallback=27)
+        sensorpins["clock"] = sensor.getint("CLOCK", fallback=4)
+
+        # get sensor error handling parameters
+        params["crc"] = sensor.getboolean("CRC", fallback=True)
+        params["retries"] = sensor.getint("RETRIES", fallback=3)
+        params["backoff"] = sensor.getfloat("BACKOFF", fallback=1.0)
+        params["maxbackoff"] = sensor.getfloat("MAX_BACKOFF", fallback=60.0)
+
+        # get sensor isolation parameters
+        params["isolate"] = sensor.getboolean("ISOLATE", fallback=False)
+        params["period"] = sensor.getfloat("PERIOD", fallback=1.0)
+        params["cpu"] = sensor.getint("CPU", fallback=None)
+        params["priority"] = sensor.getint("PRIORITY", fallback=None)
 
         # get led pins
-        ledpins = parser["LEDs"]
-        self.ledpins["green"] = ledpins.getint("GREEN", fallback=12)
-        self.ledpins["red"] = ledpins.getint("RED", fallback=19)
-        self.ledpins["yellow"] = ledpins.getint("YELLOW", fallback=20)
-        self.ledpins["blue"] = ledpins.getint("BLUE", fallback=21)
+        leds = parser["LEDs"]
+        ledpins["green"] = leds.getint("GREEN", fallback=12)
+        ledpins["red"] = leds.getint("RED", fallback=19)
+        ledpins["yellow"] = leds.getint("YELLOW", fallback=20)
+        ledpins["blue"] = leds.getint("BLUE", fallback=21)
+
+        settings["params"] = params
+        settings["sensorpins"] = sensorpins
+        settings["ledpins"] = ledpins
+
+        # get the optional export settings
+        settings["export"] = None
+        if parser.has_section("Export"):
+            section = parser["Export"]
+            export = settings["export"] = {}
+            export["target"] = section.get("TARGET",
+                    fallback="udp:127.0.0.1:9999")
+            export["station"] = section.getint("STATION", fallback=0)
+            export["batch"] = section.getint("BATCH", fallback=32)
+            export["maxage"] = section.getfloat("MAX_AGE", fallback=60.0)
+
+        # get the optional quantile sketch settings
+        settings["sketch"] = None
+        if parser.has_section("Quantiles"):
+            section = parser["Quantiles"]
+            sketch = settings["sketch"] = {}
+            sketch["file"] = section.get("FILE", fallback="./quantiles.bin")
+            sketch["bucket"] = section.getint("BUCKET", fallback=86400)
+            sketch["k"] = section.getint("K", fallback=200)
+            # 0 keeps buckets forever, either as they are or rolled up
+            sketch["keep"] = section.getint("KEEP", fallback=2592000) or None
+            sketch["rollup"] = section.getint("ROLLUP", fallback=2592000)
+            sketch["horizon"] = section.getint("HORIZON",
+                    fallback=63072000) or None
+            sketch["interval"] = section.getfloat("SAVE_INTERVAL",
+                    fallback=3600.0)
+
+        # get the optional history settings
+        settings["store"] = None
+        if parser.has_section("History"):
+            section = parser["History"]
+            store = settings["store"] = {}
+            store["file"] = section.get("FILE", fallback="./history.bin")
+            store["block"] = section.getint("BLOCK", fallback=600)
+            store["resolution"] = section.getint("RESOLUTION", fallback=1000)
+
+        return settings
+
+
+    def reload(self):
+        """
+            Requests the config file to be reloaded. The reload itself is
+            carried out by monitor() between two samples, which makes this
+            method safe to call from a signal handler (e.g. on SIGHUP).
+
+            @param: None
+
+            @return: None
+        """
+        self.__reload = True
+
+
+    def __watch(self):
+        """
+            Reloads the config file if it was requested or if the file was
+            modified since it was last read.
+
+            @param: None
+
+            @return: None
+        """
+        try:
+            mtime = os.stat(self.confpath).st_mtime_ns
+        except OSError:
+            mtime = self.__mtime
+
+        if self.__reload or mtime != self.__mtime:
+            self.__reload = False
+            self.__mtime = mtime
+            try:
+                self.__reconfigure()
+            except Exception as e:
+                print("Config reload failed: %s" % e)
+
+
+    def __reconfigure(self):
+        """
+            Re-parses the config file and applies only what changed: all
+            parameters take effect immediately, whilst only the components
+            whose settings changed are re-created, leaving all others, and
+            all in-memory state, untouched.
+            The new components are all created before any is swapped in:
+            should the file be invalid, or any of them fail to be created,
+            the running settings and components are kept.
+
+            @param: None
+
+            @return: None
+        """
+        try:
+            settings = self.__parseconfig(self.confpath)
+        except Exception as e:
+            print("Config reload failed, keeping the running settings: %s" %
+                    e)
+            return
+
+        if settings["mode"] != self.mode:
+            print("Config reload failed: changing MODE requires a restart.")
+            return
+
+        # let the consumers finish with the current components first
+        self.bus.drain()
+        changed = []
+
+        params = settings["params"]
+        sensorkeys = ["crc", "isolate", "period", "cpu", "priority"]
+        resensor = settings["sensorpins"] != self.sensorpins or \
+                any(params[key] != self.params[key] for key in sensorkeys)
+        colors = [(color, name) for color, name in [("green", "status_led"),
+                ("red", "temperature_led"), ("yellow", "humidity_led"),
+                ("blue", "query_led")]
+                if settings["ledpins"][color] != self.ledpins[color]]
+        sections = [section for section in ["export", "sketch", "store"]
+                if settings[section] != getattr(self, section)]
+
+        # create everything new, the sensor last as it has to be swapped
+        # in place; anything created is closed again on failure
+        built = {}
+        leds = {}
+        try:
+            for section in sections:
+                built[section] = self.__build(section, settings[section])
+            for color, name in colors:
+                leds[name] = LED(settings["ledpins"][color], self.mode)
+            if resensor and not self.replaying:
+                self.__resensor(params, settings["sensorpins"])
+        except Exception as e:
+            for section, component in built.items():
+                self.__discard(section, component)
+            running = set(self.ledpins.values()) | \
+                    set(self.sensorpins.values())
+            for led in leds.values():
+                if led.pin not in running:
+                    gpio.cleanup(led.pin)
+            print("Config reload failed, keeping the running settings: %s" %
+                    e)
+            return
+
+        # swap everything in
+        if settings["warnings"] != self.warnings:
+            self.warnings = settings["warnings"]
+            gpio.setwarnings(self.warnings)
+            changed.append("warnings")
+
+        if params["backoff"] != self.params["backoff"]:
+            self.__backoff = params["backoff"]
+        if params != self.params:
+            self.params = params
+            changed.append("parameters")
+
+        if resensor:
+            self.sensorpins = settings["sensorpins"]
+            changed.append("sensor")
+
+        for color, name in colors:
+            old = getattr(self, name)
+            old.off()
+            if old.pin not in settings["ledpins"].values():
+                gpio.cleanup(old.pin)
+
+            led = leds[name]
+            if name == "status_led" and self.__monitoring and \
+                    not self.degraded:
+                led.on()
+            setattr(self, name, led)
+            self.ledpins[color] = settings["ledpins"][color]
+            changed.append("%s LED" % color)
+
+        self.leds = [self.status_led, self.temperature_led, self.humidity_led,
+                self.query_led]
+
+        for section in sections:
+            setattr(self, section, settings[section])
+            self.__install(section, built[section])
+            changed.append(section)
+
+        print("Config reloaded, changed: %s" % (", ".join(changed) or "none"))
+
+
+    def __resensor(self, params, sensorpins):
+        """
+            Replaces the sensor driver by one with the given settings,
+            releasing the pins of the previous one. Should the new driver
+            fail to be created, the previous one is restarted.
+
+            @param: params - the new parameters of the station.
+
+            @param: sensorpins - the new pins of the sensor.
+
+            @return: None
+
+            @raise: the error which occured whilst creating the new driver.
+        """
+        self.sensor.close()
+        gpio.cleanup((self.sensorpins["data"], self.sensorpins["clock"]))
+
+        try:
+            self.sensor = self.__sensor(params, sensorpins)
+        except Exception:
+            self.sensor = self.__sensor(self.params, self.sensorpins)
+            raise
+
+
+    def subscribe(self, name, callback, maxsize=16, policy=Subscription.DROP):
+        """
+            Registers a consumer of the station's readings. The callback is
+            invoked from a thread of its own with every published Reading, or
+            with a Fault whenever the sensor could not be read.
+
+            @param: name - name of the consumer.
+
+            @param: callback - callable invoked with each Reading or Fault.
+
+            @param: maxsize - maximum number of items queued for the consumer.
+                default = 16
+
+            @param: policy - what to do when the queue is full.
+                Subscription.DROP  :: drop the oldest item
+                Subscription.BLOCK :: wait for the consumer
+                default = Subscription.DROP
+
+            @return: the Subscription, holding the delivery counters.
+        """
+        return self.bus.subscribe(name, callback, maxsize, policy)
 
 
     def monitor(self, run_time=600, frequency=1):
@@ -135,42 +607,227 @@ class WeatherStation(object):
             Lights the appropriate LEDs and displays the result on the LCD for
             a given ammount of time and at a specified frequency.
 
-            @param run_time: Time to run in seconds.
+            @param run_time: Time to run in seconds, None to run until
+                interrupted or until the replayed recording is exhausted.
 
             @param frequency: The frequency at which the update occurs.
 
             @return: None
         """
         self.status_led.on()
+        self.__monitoring = True
 
-        start_time = time.time()
-        end_time = start_time + run_time
+        start_time = self.clock.time()
+        end_time = None if run_time is None else start_time + run_time
+
+        while end_time is None or self.clock.time() <= end_time:
+            # apply any changes to the config file
+            self.__watch()
 
-        while time.time() <= end_time:
             # query the sensor
             self.query_led.on()
             try:
-                temperature = self.sensor.temperature()
-                humidity = self.sensor.humidity(temperature)
-            except Exception:
-                self.sensor.reset()
-                time.sleep(1)
+                raw = self.__acquire()
+            except ReplayExhausted:
+                break
+            finally:
+                self.query_led.off()
+
+            if raw is None:
+                self.clock.sleep(frequency)
                 continue
-            self.query_led.off()
 
-            # trigger appropriate LEDs
-            self.__trigger_leds(humidity, temperature)
+            # samples of an acquisition process are stamped by the child,
+            # when they were taken rather than when they were picked up
+            if isinstance(self.sensor, Acquisition):
+                timestamp = self.sensor.timestamp
+            else:
+                timestamp = self.clock.time()
+
+            rawt, rawh = raw
+            temperature = SHT11.convert_temperature(rawt)
+            humidity = SHT11.convert_humidity(rawh, temperature)
+            reading = Reading(timestamp, rawt, rawh, temperature,
+                    humidity, *Psychrometrics.derive(temperature, humidity))
+
+            # hand the reading to all of its consumers
+            self.bus.publish(reading)
+
+            self.clock.sleep(frequency)
+
+        # let the consumers catch up before touching the hardware ourselves
+        self.bus.drain()
+        self.__monitoring = False
 
-            # write values on the LCD
-            self.__lcd_write("%.2f %s" % (temperature, "(C)"),
-                    "%.2f %s" % (humidity, "(RH%)"))
+        # the replay only ends once its samples were consumed
+        if self.replaying:
+            self.clock.stop()
 
-            time.sleep(frequency)
+        if self.exporter is not None:
+            self.exporter.flush()
+        if self.history is not None:
+            self.history.flush()
+        if self.quantiles is not None:
+            self.quantiles.save(self.sketch["file"])
 
         self.clear()
         self.__lcd_write("WEATHERSTATION", "OPERATIONAL")
 
 
+    def __acquire(self):
+        """
+            Reads both raw words off the sensor, retrying a bounded number of
+            times on failure. Each failure is counted by its kind and met
+            with an increasingly thorough recovery: a plain retry, then a
+            soft reset, then hard resets spaced by an exponential backoff
+            which keeps growing across cycles for as long as the sensor
+            keeps failing.
+            Should all attempts fail, the station is marked as degraded.
+
+            @param: None
+
+            @return: tuple of the raw temperature and humidity words, or None
+                if no reading could be obtained during this cycle.
+        """
+        error = None
+        for attempt in range(self.params["retries"] + 1):
+            try:
+                raw = self.sensor.raw()
+            except SensorError as e:
+                error = e
+                self.errors[e.kind] += 1
+                self.__recover(attempt)
+                continue
+
+            self.__backoff = self.params["backoff"]
+            if self.degraded:
+                self.degraded = False
+                self.status_led.on()
+            return raw
+
+        self.__degrade(error)
+        return None
+
+
+    def __recover(self, attempt):
+        """
+            Attempts to bring the sensor back to a working state after a
+            failed read.
+
+            @param: attempt - the number of the attempt which failed,
+                starting from 0.
+                0     :: nothing, the read is simply retried
+                1     :: soft reset
+                2+    :: hard reset, followed by the current backoff
+
+            @return: None
+        """
+        if attempt == 0:
+            return
+
+        if attempt == 1:
+            try:
+                self.sensor.softreset()
+            except SensorError as e:
+                self.errors[e.kind] += 1
+            return
+
+        self.sensor.reset()
+        time.sleep(self.__backoff)
+        self.__backoff = min(self.__backoff * 2, self.params["maxbackoff"])
+
+
+    def __degrade(self, error):
+        """
+            Signals that the sensor could not be read: the status LED is
+            turned off and a Fault is published, on which the alert LEDs are
+            cleared as their state is stale and the failure is written on the
+            LCD.
+
+            @param: error - the last SensorError which occured.
+
+            @return: None
+        """
+        if not self.degraded:
+            print("Sensor degraded: %s" % error)
+        self.degraded = True
+
+        self.status_led.off()
+        self.bus.publish(Fault(self.clock.time(), error.kind,
+                self.errors[error.kind]))
+
+
+    def __export(self, reading):
+        """
+            Pushes a reading to the collector. Faults carry no reading, but
+            still send out the pending batch once it has grown too old.
+
+            @param: reading - current Reading or Fault.
+
+            @return: None
+        """
+        if isinstance(reading, Reading):
+            self.exporter.push(reading)
+        else:
+            self.exporter.tick(reading.timestamp)
+
+
+    def __store(self, reading):
+        """
+            Appends a reading to the history file.
+
+            @param: reading - current Reading or Fault.
+
+            @return: None
+        """
+        if isinstance(reading, Reading):
+            self.history.append(reading)
+
+
+    def __sketch(self, reading):
+        """
+            Adds a reading to the quantile sketches, saving them to their file
+            once every save interval.
+
+            @param: reading - current Reading or Fault.
+
+            @return: None
+        """
+        if not isinstance(reading, Reading):
+            return
+
+        self.quantiles.update(reading)
+
+        if self.__saved is None:
+            self.__saved = reading.timestamp
+        elif reading.timestamp - self.__saved >= self.sketch["interval"]:
+            self.quantiles.save(self.sketch["file"])
+            self.__saved = reading.timestamp
+
+
+    def __display(self, reading):
+        """
+            Writes the selected metrics of a reading on the LCD, or the
+            failure if the sensor could not be read.
+
+            @param: reading - current Reading or Fault.
+
+            @return: None
+        """
+        if isinstance(reading, Fault):
+            self.__lcd_write("SENSOR DEGRADED", "%s ERR x%d" %
+                    (reading.kind.upper(), reading.count))
+            return
+
+        # rendered into the preallocated buffers of the renderer, and only
+        # sent to the LCD if changed
+        line1, line2 = self.params["display"]
+        if self.renderer.render(1, getattr(reading, line1), line1):
+            self.lcd.writebytes(self.renderer.lines[0], line=1)
+        if self.renderer.render(2, getattr(reading, line2), line2):
+            self.lcd.writebytes(self.renderer.lines[1], line=2)
+
+
     def __lcd_write(self, line1="", line2=""):
         """
             Centers and writes the two lines to the LCD.
@@ -181,20 +838,29 @@ class WeatherStation(object):
 
             @return: None
         """
+        self.renderer.invalidate()
         self.lcd.writeline(line1.center(self.lcd.SCREENWIDTH, " "), line=1)
         self.lcd.writeline(line2.center(self.lcd.SCREENWIDTH, " "), line=2)
 
 
-    def __trigger_leds(self, humidity, temperature):
+    def __trigger_leds(self, reading):
         """
             Lights up the LEDs based on the current status.
+            The temperature and humidity intervals are checked against the
+            metrics selected by ALERT_TEMP and ALERT_HUMID respectively.
+            On a Fault, both are turned off as their state is stale.
 
-            @param: humidity - current humidity reading.
-
-            @param: temperature - current temperature reading.
+            @param: reading - current Reading or Fault.
 
             @return: None
         """
+        if isinstance(reading, Fault):
+            self.temperature_led.off()
+            self.humidity_led.off()
+            return
+
+        temperature = getattr(reading, self.params["alertt"])
+        humidity = getattr(reading, self.params["alerth"])
 
         if self.params["minh"] > humidity or self.params["maxh"] < humidity:
             self.humidity_led.on()
@@ -220,6 +886,7 @@ class WeatherStation(object):
 
         self.sensor.reset()
 
+        self.renderer.invalidate()
         self.lcd.clear()
 
 
@@ -235,5 +902,13 @@ class WeatherStation(object):
 
             @return: None
         """
+        self.bus.close()
+        if self.quantiles is not None:
+            self.quantiles.save(self.sketch["file"])
         self.clear()
+        self.sensor.close()
+        if self.exporter is not None:
+            self.exporter.close()
+        if self.history is not None:
+            self.history.close()
         gpio.cleanup()
@@ -3,21 +3,24 @@
 
 import argparse, signal, sys
 
+from Replay import Replay
 from WeatherStation import WeatherStation
 
 
 # set up command line argument parser
 parser = argparse.ArgumentParser()
-parser.add_argument("-r", "--runtime", default=600, type=int,
-                    help="Time the script should run in seconds")
+parser.add_argument("-r", "--runtime", default=None, type=int,
+                    help="Time the script should run in seconds "
+                         "(default: 600, or the whole recording on replay)")
 parser.add_argument("-f", "--frequency", default=1, type=int,
                     help="Sensor read frequency in seconds")
 parser.add_argument("-c", "--config", default="./example.conf",
                     help="Station configuration file")
-
-# parse command line arguments
-args = parser.parse_args()
-
+parser.add_argument("--replay", default=None,
+                    help="Recording of raw samples to replay instead of "
+                         "querying the sensor")
+parser.add_argument("--speed", default=1.0, type=float,
+                    help="Replay speed factor, 0 to replay as fast as possible")
 
 def signal_handler(signum, frame):
     """
@@ -31,15 +34,33 @@ def signal_handler(signum, frame):
     sys.exit(0)
 
 
-# instantiate weather station
-weather_station = WeatherStation(args.config)
+# only run if main; the acquisition process imports this module as well
+if __name__ == "__main__":
+    # parse command line arguments
+    args = parser.parse_args()
 
-# set signal handler
-signal.signal(signal.SIGINT, signal_handler)
+    # set up the replay, if any
+    replay = None
+    runtime = args.runtime
+    if args.replay is not None:
+        replay = Replay(args.replay, args.speed)
+    elif runtime is None:
+        runtime = 600
 
-# only run if main
-if __name__ == "__main__":
-    weather_station.monitor(args.runtime, args.frequency)
+    # instantiate weather station
+    weather_station = WeatherStation(args.config, replay)
 
-# cleanup at the end of the script
-weather_station.cleanup()
+    # set signal handlers
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGHUP,
+            lambda signum, frame: weather_station.reload())
+
+    # run the weather station
+    weather_station.monitor(runtime, args.frequency)
+
+    if replay is not None:
+        print("Replayed %d samples (%.1f samples/s)." %
+                (replay.samples, replay.rate()))
+
+    # cleanup at the end of the script
+    weather_station.cleanup()
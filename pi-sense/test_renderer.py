@@ -0,0 +1,114 @@
+# Copyright 2014 Nashwan Azhari, Robert Krody, Tudor Vioreanu.
+# Licensed under the GPLv2, see LICENSE for details.
+
+import gc, importlib.util, math, sys, tracemalloc, types, unittest
+
+# stand in for RPi.GPIO when not running on a Pi
+if importlib.util.find_spec("RPi") is None:
+    gpio = types.ModuleType("RPi.GPIO")
+    gpio.BCM, gpio.BOARD, gpio.OUT, gpio.IN = 11, 10, 0, 1
+    def nop(*args):
+        return None
+
+    def low(channel):
+        return 0
+
+    for name in ["setmode", "setwarnings", "setup", "output", "cleanup"]:
+        setattr(gpio, name, nop)
+    gpio.input = low
+
+    rpi = types.ModuleType("RPi")
+    rpi.GPIO = gpio
+    sys.modules["RPi"] = rpi
+    sys.modules["RPi.GPIO"] = gpio
+
+from LCD import LCD
+from Renderer import Renderer
+
+
+UNITS = {"temperature": "(C)", "humidity": "(RH%)", "dewpoint": "(DP C)",
+        "absolute": "(g/m3)", "heatindex": "(HI C)"}
+
+
+class TestRenderer(unittest.TestCase):
+
+    def setUp(self):
+        self.renderer = Renderer(UNITS, LCD.SCREENWIDTH)
+
+
+    def expected(self, value, metric):
+        return ("%.2f %s" % (value, UNITS[metric])).center(
+                LCD.SCREENWIDTH)[:LCD.SCREENWIDTH].encode("latin-1")
+
+
+    def test_layout(self):
+        values = [0.0, -0.0, -0.004, 0.125, -40.125, 1.005, 2.675, 9.995,
+                23.456, -12.3, 99.999, 125.0, 1e5, -1234.5, 1e300,
+                math.nan, math.inf, -math.inf]
+        values += [k / 1000.0 for k in range(-40000, 125001, 7)]
+
+        for value in values:
+            for metric in UNITS:
+                self.renderer.invalidate()
+                self.renderer.render(1, value, metric)
+                self.assertEqual(bytes(self.renderer.lines[0]),
+                        self.expected(value, metric), (value, metric))
+
+
+    def test_changed(self):
+        self.assertTrue(self.renderer.render(1, 21.5, "temperature"))
+        self.assertFalse(self.renderer.render(1, 21.5, "temperature"))
+        self.assertFalse(self.renderer.render(1, 21.501, "temperature"))
+        self.assertTrue(self.renderer.render(1, 21.51, "temperature"))
+        self.assertTrue(self.renderer.render(2, 21.51, "temperature"))
+
+        self.renderer.invalidate()
+        self.assertTrue(self.renderer.render(1, 21.51, "temperature"))
+
+
+    def test_steady_state_allocations(self):
+        lcd = LCD()
+        renderer = self.renderer
+        temperatures = [20.0 + i * 0.37 for i in range(50)]
+        humidities = [40.0 + i * 0.53 for i in range(50)]
+
+        # the loops are indexed so that the cycle itself allocates nothing
+        def cycle():
+            index = 0
+            while index < len(temperatures):
+                if renderer.render(1, temperatures[index], "temperature"):
+                    lcd.writebytes(renderer.lines[0], line=1)
+                if renderer.render(2, humidities[index], "humidity"):
+                    lcd.writebytes(renderer.lines[1], line=2)
+                index += 1
+
+        def idle():
+            pass
+
+        def peak(function):
+            # what is allocated at any point while running the function,
+            # beyond what is held before, less what measuring costs itself
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            function()
+            return tracemalloc.get_traced_memory()[1] - current
+
+        # warm up, also whilst tracing so that objects cached for reuse by
+        # the interpreter are already accounted for
+        cycle()
+        gc.collect()
+
+        tracemalloc.start()
+        try:
+            cycle()
+            peak(idle)
+            overhead = peak(idle)
+            allocated = peak(cycle) - overhead
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(allocated, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()